@@ -1,9 +1,10 @@
 import contextlib
+import itertools
 import os
-import uuid
 
 from proton import Disposition
 
+from aorta.lib.entropy import randhex
 import aorta.lib.timezone
 
 
@@ -40,15 +41,76 @@ class BaseBuffer:
     """
     initial_backoff = 5000
 
+    #: Indicates if :meth:`transfer_batch()` invokes :meth:`peek()` before
+    #: starting a transaction. Implementations for which :meth:`peek()` is
+    #: as expensive as :meth:`pop_many()` should disable it.
+    peek_before_transfer = True
+
+    def __init__(self):
+        # Delivery tags consist of a random prefix that is generated once
+        # per instance and process, followed by a monotonically increasing
+        # counter, to avoid reading from the random source on every
+        # transfer. See generate_tag().
+        self._reset_tags()
+
+        # Links send many messages to the same peer, so the parsed host
+        # strings are cached.
+        self._hosts = {}
+
+        # The retransmission delays for the first delivery attempts are
+        # computed on first use, and again if initial_backoff changes;
+        # see backoff().
+        self._backoff_base = None
+        self._backoff = ()
+
+        # Maps the terminal delivery states to their handlers.
+        self._outcomes = {
+            Disposition.ACCEPTED: self.on_accepted,
+            Disposition.REJECTED: self.on_rejected,
+            Disposition.RELEASED: self.on_released,
+            Disposition.MODIFIED: self.on_modified
+        }
+
     def backoff(self, n):
         """Calculate the delay in microsecond how long a message must be
         held before being retransmitted.
         """
+        if self._backoff_base != self.initial_backoff:
+            self._backoff_base = self.initial_backoff
+            self._backoff = tuple(int(self.initial_backoff * (1.25**i))
+                for i in range(32))
+        if n < len(self._backoff):
+            return self._backoff[n]
         return int(self.initial_backoff * (1.25**n))
 
+    def parse_host(self, host):
+        """Split a string in the format ``host:port`` into a tuple
+        containing the address and the port.
+        """
+        try:
+            return self._hosts[host]
+        except KeyError:
+            addr, port = host.split(':')
+            assert port.isdigit(), "Invalid host: %s" % host
+            self._hosts[host] = result = (addr, port)
+            return result
+
     def generate_tag(self):
         """Generates a globally unique delivery tag."""
-        return uuid.UUID(bytes=os.urandom(16)).hex
+        # Draw a new prefix if the counter is exhausted, or if the
+        # process was forked, so that tags are not repeated.
+        if self._tag_pid != os.getpid():
+            self._reset_tags()
+        n = next(self._tag_counter)
+        if n > 0xffffffff:
+            self._reset_tags()
+            n = next(self._tag_counter)
+        return self._tag_prefix + format(n, '08x')
+
+    def _reset_tags(self):
+        self._tag_pid = os.getpid()
+        self._tag_prefix = randhex(12)
+        self._tag_counter = itertools.count()
 
     def now(self):
         """Return an aware :class:`int` instance representing the
@@ -75,6 +137,16 @@ class BaseBuffer:
             on_settled(message)
         return retval
 
+    def put_many(self, messages, delay=None, on_settled=None):
+        """Place multiple messages on the message queue in a single
+        transaction. If `on_settled` is callable, it is invoked for
+        each message after the transaction is committed.
+        """
+        self.enqueue_many(messages, *self.delay(delay))
+        if callable(on_settled):
+            for message in messages:
+                on_settled(message)
+
     def get(self, tag):
         """Return a :class:`proton.Message` instance by its
         delivery tag.
@@ -96,6 +168,25 @@ class BaseBuffer:
         """
         raise NotImplementedError
 
+    def enqueue_many(self, messages, qat, nbf):
+        """Queue multiple messages for transmission in a single
+        transaction.
+
+        Args:
+            messages (list): the :class:`proton.Message` instances
+                to enqueue.
+            qat (int): the date and time at which
+                the messages were queued.
+            nbf (int): the date and time before which
+                the messages may not be transmitted.
+
+        Returns:
+            None
+        """
+        with self.transaction():
+            for message in messages:
+                self.enqueue(message, qat, nbf)
+
     def pop(self):
         """Return the next :class:`proton.Message` instance
         that is queued for transmission. This may delete the
@@ -103,6 +194,31 @@ class BaseBuffer:
         """
         raise NotImplementedError
 
+    def peek(self, now):
+        """Return a boolean indicating if the queue holds a message that
+        may be transmitted at `now`, in milliseconds since the UNIX
+        epoch. This method is used to avoid the overhead of starting a
+        transaction when there is nothing to transmit. The default
+        implementation always returns ``True``.
+        """
+        return True
+
+    def pop_many(self, n):
+        """Return a list containing at most `n` :class:`proton.Message`
+        instances that are queued for transmission. The default
+        implementation invokes :meth:`pop()` until the queue is
+        exhausted or `n` messages are retrieved; implementations
+        should override this method if they are able to retrieve
+        multiple messages more efficiently.
+        """
+        messages = []
+        while len(messages) < n:
+            message = self.pop()
+            if message is None:
+                break
+            messages.append(message)
+        return messages
+
     def transfer(self, host, source, target, sender, channel=None):
         """Transmit the next message in the queue to the AMQP remote
         peer. Return the delivery tag.
@@ -119,27 +235,72 @@ class BaseBuffer:
         Returns:
             str
         """
-        if not sender.credit:
-            return None
+        tags = self.transfer_batch(host, source, target, sender,
+            channel=channel, limit=1)
+        return tags[0] if tags else None
 
-        addr, port = host.split(':')
-        assert port.isdigit(), "Invalid host: %s" % host
+    def transfer_batch(self, host, source, target, sender, channel=None,
+        limit=None):
+        """Transmit at most `limit` messages in the queue to the AMQP
+        remote peer, bounded by the credit of `sender`. All messages
+        are retrieved and tracked in a single transaction. Return a
+        list containing the delivery tags.
+
+        Args:
+            host (str): a string in the format ``host:port`` identifying
+                the remote AMQP peer.
+            source (str): the name of the source (local) container.
+            target (str): the name of the target (remote) container.
+            sender (proton.Sender): the link over which the messages
+                will be sent.
+            channel (str): specifies the remote address.
+            limit (int): the maximum number of messages to transfer. If
+                `limit` is ``None``, up to the credit of `sender` are
+                transferred.
+
+        Returns:
+            list
+        """
+        n = sender.credit
+        if limit is not None:
+            n = min(n, limit)
+        if n <= 0:
+            return []
+        if self.peek_before_transfer and not self.peek(self.now()):
+            return []
+
+        addr, port = self.parse_host(host)
+        deliveries = []
         with self.transaction():
-            message = self.pop()
-            if message is None:
-                return
+            for message in self.pop_many(n):
+                if channel is not None:
+                    message.address = channel
 
-            if channel is not None:
-                message.address = channel
+                tag = self.generate_tag()
+                delivery = sender.send(message, tag)
 
-            tag = self.generate_tag()
-            delivery = sender.send(message, tag)
+                assert delivery.tag == tag
+                deliveries.append((tag, message))
 
-            assert delivery.tag == tag
-            self.track(host, port, source, target, sender.name,
-                delivery.tag, message)
+            if deliveries:
+                self.track_many(host, port, source, target, sender.name,
+                    deliveries)
 
-        return tag
+        return [tag for tag, message in deliveries]
+
+    def release(self, message):
+        """Release a :class:`proton.Message` instance that was returned
+        by :meth:`get()` or :meth:`pop()` and is no longer used, so that
+        implementations may reuse it. The default implementation does
+        nothing.
+        """
+        pass
+
+    def close(self):
+        """Release the resources held by the buffer, such as open file
+        descriptors. The default implementation does nothing.
+        """
+        pass
 
     def track(self, host, port, source, target, link, tag, message):
         """Track the delivery of `message` to the AMQP remote peer.
@@ -152,6 +313,25 @@ class BaseBuffer:
         """
         raise NotImplementedError
 
+    def track_many(self, host, port, source, target, link, deliveries):
+        """Track the delivery of multiple messages to the AMQP remote
+        peer. The default implementation invokes :meth:`track()` for
+        each delivery.
+
+        Args:
+            host (str): IP address of the AMQP peer.
+            port (int): port at which the AMQP peer is listening.
+            source (str): source name, if applicable.
+            target (str): target name, if applicable.
+            link (str): link identifier.
+            deliveries (list): a list of ``(tag, message)`` tuples.
+
+        Returns:
+            None
+        """
+        for tag, message in deliveries:
+            self.track(host, port, source, target, link, tag, message)
+
     @contextlib.contextmanager
     def transaction(self):
         """Start a transaction. The default implementation does nothing;
@@ -200,17 +380,9 @@ class BaseBuffer:
         Returns:
             None
         """
-        if remote_state == Disposition.ACCEPTED:
-            self.on_accepted(delivery, self.get(delivery.tag),
-                disposition=disposition)
-        if remote_state == Disposition.REJECTED:
-            self.on_rejected(delivery, self.get(delivery.tag),
-                disposition=disposition)
-        if remote_state == Disposition.RELEASED:
-            self.on_released(delivery, self.get(delivery.tag),
-                disposition=disposition)
-        if remote_state == Disposition.MODIFIED:
-            self.on_modified(delivery, self.get(delivery.tag),
+        handler = self._outcomes.get(remote_state)
+        if handler is not None:
+            handler(delivery, self.get(delivery.tag),
                 disposition=disposition)
 
     def on_accepted(self, delivery, message, disposition):
@@ -0,0 +1,361 @@
+import contextlib
+import heapq
+import os
+import struct
+
+from .spooled import NBF
+from .spooled import SpooledBuffer
+import aorta.lib.timezone
+
+
+# Every record in the journal starts with a header containing the record
+# type, the not-before timestamp in milliseconds since the UNIX epoch and
+# the length of the payload.
+RECORD = struct.Struct('>BQI')
+R_ENQUEUE = 1
+R_TOMBSTONE = 2
+
+# The payload of a tombstone identifies the segment and the offset of the
+# enqueued record that it removes from the queue.
+TOMBSTONE = struct.Struct('>QQ')
+
+
+class JournaledBuffer(SpooledBuffer):
+    """A :class:`SpooledBuffer` implementation that keeps the queue
+    in append-only journal segments, instead of writing a file for
+    each message. Deliveries and failed messages are persisted in
+    the same way as :class:`SpooledBuffer` does.
+
+    Enqueued messages are appended to the active segment. An in-memory
+    index, rebuilt from the journal on startup, maps the not-before
+    timestamp of each queued message to its position in the journal.
+    When a message is popped, a tombstone record is appended. Segments
+    are rotated when they exceed :attr:`segment_size` bytes and removed
+    when they no longer contain queued messages. If more than
+    :attr:`max_segments` segments remain, e.g. because an old segment
+    holds a message that is delayed, the buffer is compacted.
+
+    Messages that were queued by a :class:`SpooledBuffer` using the same
+    spool directory are moved into the journal on startup.
+
+    The index is private to the process that owns the buffer; unlike
+    :class:`SpooledBuffer`, multiple processes may not share the same
+    spool directory to enqueue messages.
+    """
+    segment_size = 64 * 1024 * 1024
+
+    # The queue is inspected in memory.
+    peek_before_transfer = True
+
+    #: The number of segments above which the buffer is compacted.
+    max_segments = 16
+
+    def __init__(self, spool='/var/spool/aorta', segment_size=None,
+        max_segments=None):
+        super(JournaledBuffer, self).__init__(spool=spool)
+        if segment_size is not None:
+            self.segment_size = segment_size
+        if max_segments is not None:
+            self.max_segments = max_segments
+        os.makedirs(self.abspath('journal'), exist_ok=True)
+        self._journal_fd = os.open(self.abspath('journal'),
+            os.O_RDONLY|os.O_DIRECTORY|os.O_CLOEXEC)
+
+        # Maps the segment identifiers to the number of queued messages
+        # they contain.
+        self._segments = {}
+        self._readers = {}
+        self._index = []
+
+        # The index entries of the messages that were popped in the
+        # current transaction. Their tombstones are appended when the
+        # transaction commits.
+        self._popped = []
+
+        # The index entries of the messages that were enqueued in the
+        # current transaction. They are removed from the queue if the
+        # transaction is rolled back.
+        self._enqueued = []
+        self._dirty = False
+        self._fd = None
+        self._segment = None
+        self._offset = 0
+        self._replay()
+        self._import()
+
+    def enqueue(self, message, qat, nbf):
+        """Queue a new message for transmission.
+
+        Args:
+            message (proton.Message): the message to enqueue.
+            qat (int): the date and time at which
+                the message was queued.
+            nbf (int): the date and time before which
+                the message may not be transmitted.
+
+        Returns:
+            None
+
+        Messages that are not flagged as durable are not synced to
+        the storage medium and may be lost if the system crashes.
+        """
+        if self._offset >= self.segment_size:
+            self._rotate()
+        payload = message.encode()
+        offset = self._append(R_ENQUEUE, nbf, payload)
+        entry = (nbf, next(self._seq), self._segment, offset, len(payload))
+        heapq.heappush(self._index, entry)
+        self._segments[self._segment] += 1
+        if self._pending is not None:
+            self._enqueued.append(entry)
+        if message.durable and self._pending is None:
+            self._sync()
+
+    def peek(self, now):
+        """Return a boolean indicating if the queue holds a message that
+        may be transmitted at `now`.
+        """
+        return bool(self._index) and self._index[0][0] <= now
+
+    def pop_many(self, n):
+        """Return a list containing at most `n` :class:`proton.Message`
+        instances that are queued for transmission.
+
+        The tombstones of the returned messages are appended when the
+        transaction commits, after the files written in the same
+        transaction (e.g. the delivery states) are persisted. If the
+        transaction is rolled back, the messages remain queued.
+        """
+        with self.transaction():
+            now = aorta.lib.timezone.now()
+            messages = []
+            while self._index and len(messages) < n:
+                if self._index[0][0] > now:
+                    break
+                entry = heapq.heappop(self._index)
+                self._popped.append(entry)
+                nbf, seq, segment, offset, length = entry
+                message = self._message()
+                message.decode(os.pread(self._reader(segment), length,
+                    offset))
+                messages.append(message)
+
+            return messages
+
+    @contextlib.contextmanager
+    def transaction(self):
+        """Start a transaction. In addition to the behavior of
+        :meth:`SpooledBuffer.transaction()`, the messages popped in the
+        transaction are returned to the queue if an exception occurs,
+        and the messages enqueued in the transaction are removed from
+        it.
+        """
+        if self._pending is not None:
+            yield
+            return
+
+        try:
+            with super(JournaledBuffer, self).transaction():
+                yield
+        except Exception:
+            for entry in self._popped:
+                heapq.heappush(self._index, entry)
+            if self._enqueued:
+                self._discard(self._enqueued)
+            raise
+        finally:
+            self._popped = []
+            self._enqueued = []
+
+    def commit(self):
+        """Ensure that all files written in the current transaction are
+        persisted, then append the tombstones of the popped messages and
+        sync the journal once. Segments that no longer contain queued
+        messages are removed afterwards.
+        """
+        super(JournaledBuffer, self).commit()
+        popped = self._popped
+        for nbf, seq, segment, offset, length in popped:
+            self._append(R_TOMBSTONE, nbf, TOMBSTONE.pack(segment, offset))
+            self._segments[segment] -= 1
+        if self._dirty:
+            self._sync()
+        self._popped = []
+        self._enqueued = []
+        if popped:
+            self._collect()
+            if len(self._segments) > self.max_segments:
+                self.compact()
+
+    def compact(self):
+        """Copy the queued messages from all inactive segments to the
+        active segment, and remove the inactive segments. If the process
+        is interrupted before the old segments are removed, the copied
+        messages may be transmitted twice.
+        """
+        self._rotate()
+        entries = [x for x in self._index if x[2] != self._segment]
+        index = [x for x in self._index if x[2] == self._segment]
+        for nbf, seq, segment, offset, length in entries:
+            payload = os.pread(self._reader(segment), length, offset)
+            index.append((nbf, seq, self._segment,
+                self._append(R_ENQUEUE, nbf, payload), length))
+            self._segments[segment] -= 1
+            self._segments[self._segment] += 1
+        heapq.heapify(index)
+        self._index = index
+        self._sync()
+        self._collect()
+
+    def close(self):
+        """Close the file descriptors held by the buffer."""
+        for fd in getattr(self, '_readers', {}).values():
+            os.close(fd)
+        self._readers = {}
+        for attname in ('_fd', '_journal_fd'):
+            fd = getattr(self, attname, None)
+            if fd is not None:
+                os.close(fd)
+                setattr(self, attname, None)
+        super(JournaledBuffer, self).close()
+
+    def _append(self, kind, nbf, payload):
+        # Append a record to the active segment and return the offset
+        # of its payload.
+        header = RECORD.pack(kind, nbf, len(payload))
+        os.writev(self._fd, [header, payload])
+        offset = self._offset + len(header)
+        self._offset = offset + len(payload)
+        self._dirty = True
+        return offset
+
+    def _discard(self, entries):
+        # Remove the entries from the index and append their tombstones,
+        # so that they are not restored when the journal is replayed.
+        seqs = set(x[1] for x in entries)
+        self._index = [x for x in self._index if x[1] not in seqs]
+        heapq.heapify(self._index)
+        for nbf, seq, segment, offset, length in entries:
+            self._append(R_TOMBSTONE, nbf, TOMBSTONE.pack(segment, offset))
+            self._segments[segment] -= 1
+        self._sync()
+        self._collect()
+
+    def _sync(self):
+        os.fsync(self._fd)
+        self._dirty = False
+
+    def _reader(self, segment):
+        if segment not in self._readers:
+            self._readers[segment] = os.open(self._segment_name(segment),
+                os.O_RDONLY, dir_fd=self._journal_fd)
+        return self._readers[segment]
+
+    def _rotate(self):
+        # Start a new segment. The active segment is synced first,
+        # because its records may not be lost after the segment is
+        # no longer written to.
+        segment = 0
+        if self._fd is not None:
+            self._sync()
+            os.close(self._fd)
+            segment = self._segment + 1
+        self._open(segment, 0)
+        os.fsync(self._journal_fd)
+
+    def _open(self, segment, offset):
+        self._fd = os.open(self._segment_name(segment),
+            os.O_WRONLY|os.O_CREAT|os.O_APPEND, 0o666, dir_fd=self._journal_fd)
+        self._segment = segment
+        self._segments.setdefault(segment, 0)
+        self._offset = offset
+
+    def _collect(self):
+        # Remove the oldest segments that do not contain any queued
+        # messages. Tombstones always refer to records in the same or
+        # in an older segment, so segments are removed in order.
+        for segment in sorted(self._segments):
+            if segment == self._segment or self._segments[segment]:
+                break
+            if segment in self._readers:
+                os.close(self._readers.pop(segment))
+            os.unlink(self._segment_name(segment), dir_fd=self._journal_fd)
+            del self._segments[segment]
+
+    def _replay(self):
+        # Rebuild the index from the journal segments on disk.
+        live = {}
+        segments = sorted(int(x[:-4], 16)
+            for x in os.listdir(self._journal_fd) if x.endswith('.log'))
+        offset = 0
+        for segment in segments:
+            self._segments[segment] = 0
+            offset = self._replay_segment(segment, live)
+
+        for segment, offset_, nbf, length in sorted(
+            (k[0], k[1], v[0], v[1]) for k, v in live.items()):
+            self._index.append((nbf, next(self._seq), segment, offset_,
+                length))
+            self._segments[segment] += 1
+        heapq.heapify(self._index)
+
+        if segments:
+            self._open(segments[-1], offset)
+        else:
+            self._rotate()
+        self._collect()
+
+    def _replay_segment(self, segment, live):
+        # Read all records in the segment and return the offset at which
+        # the last complete record ends. An incomplete record at the end
+        # of the segment, caused by an interrupted write, is truncated.
+        fd = os.open(self._segment_name(segment), os.O_RDWR,
+            dir_fd=self._journal_fd)
+        with open(fd, 'r+b') as f:
+            data = f.read()
+            offset = 0
+            while offset + RECORD.size <= len(data):
+                kind, nbf, length = RECORD.unpack_from(data, offset)
+                start = offset + RECORD.size
+                if start + length > len(data):
+                    break
+                if kind == R_ENQUEUE:
+                    live[(segment, start)] = (nbf, length)
+                elif kind == R_TOMBSTONE:
+                    live.pop(TOMBSTONE.unpack_from(data, start), None)
+                offset = start + length
+
+            if offset < len(data):
+                self.logger.warning("Truncating incomplete record in %s",
+                    self.abspath('journal', self._segment_name(segment)))
+                f.truncate(offset)
+        return offset
+
+    def _import(self):
+        # Append the messages queued as files in the spool directory to
+        # the journal. The files are removed after the journal is synced;
+        # if the process is interrupted before, the messages may be
+        # transmitted twice.
+        filenames = self._list_queued()
+        if not filenames:
+            return
+        for filename in filenames:
+            fd = os.open(filename, os.O_RDONLY, dir_fd=self._dir_fd)
+            data = self._read(fd)
+            nbf, = NBF.unpack_from(data)
+            payload = data[NBF.size:]
+            heapq.heappush(self._index, (nbf, next(self._seq), self._segment,
+                self._append(R_ENQUEUE, nbf, payload), len(payload)))
+            self._segments[self._segment] += 1
+        self._sync()
+        for filename in filenames:
+            os.unlink(filename, dir_fd=self._dir_fd)
+        os.fsync(self._dir_fd)
+        self.logger.info("Imported %s queued messages into the journal",
+            len(filenames))
+
+    def _segment_name(self, segment):
+        return '%016x.log' % segment
+
+    def __len__(self):
+        return len(self._index)
@@ -1,3 +1,6 @@
+import heapq
+import itertools
+
 from .base import BaseBuffer
 
 
@@ -20,8 +23,12 @@ class NullBuffer(BaseBuffer):
         return len(self._queue)
 
     def __init__(self, *args, **kwargs):
-        super(BaseBuffer, self).__init__(*args, **kwargs)
+        super(NullBuffer, self).__init__(*args, **kwargs)
+        # The queue is a heap ordered by the not-before timestamp; the
+        # sequence number preserves insertion order for messages with
+        # equal timestamps.
         self._queue = []
+        self._seq = itertools.count()
         self._deliveries = {}
         self._errors = {}
 
@@ -46,24 +53,34 @@ class NullBuffer(BaseBuffer):
         Returns:
             None
         """
-        self._queue.append([message, qat, nbf])
+        heapq.heappush(self._queue, (nbf, next(self._seq), message))
 
     def pop(self):
         """Return the next :class:`proton.Message` instance
         that is queued for transmission. This may delete the
         message data from the persistent storage medium.
         """
-        now = self.now()
-        for i, item in enumerate(self._queue):
-            message, qat, nbf = item
-            if nbf > now:
-                continue
-
-            break
-        else:
+        if not self._queue or self._queue[0][0] > self.now():
             return None
+        return heapq.heappop(self._queue)[2]
 
-        return self._queue.pop(i)[0]
+    def peek(self, now):
+        """Return a boolean indicating if the queue holds a message that
+        may be transmitted at `now`.
+        """
+        return bool(self._queue) and self._queue[0][0] <= now
+
+    def pop_many(self, n):
+        """Return a list containing at most `n` :class:`proton.Message`
+        instances that are queued for transmission.
+        """
+        now = self.now()
+        messages = []
+        while self._queue and len(messages) < n:
+            if self._queue[0][0] > now:
+                break
+            messages.append(heapq.heappop(self._queue)[2])
+        return messages
 
     def track(self, host, port, source, target, link, tag, message):
         """Track the delivery of `message` to the AMQP remote peer.
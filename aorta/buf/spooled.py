@@ -1,14 +1,30 @@
-import glob
+import collections
+import contextlib
+import itertools
 import logging
 import os
+import re
+import struct
 import tempfile
 
-import proton
-
+from aorta.messaging import MessagePool
 from .base import BaseBuffer
 import aorta.lib.timezone
 
 
+# Spooled messages start with the not-before timestamp, in milliseconds
+# since the UNIX epoch, as an unsigned 64-bit big-endian integer.
+NBF = struct.Struct('>Q')
+
+# Matches the names of queued messages that are prefixed with their
+# not-before timestamp, see SpooledBuffer.enqueue().
+QUEUED_NAME = re.compile('^[0-9a-f]{16}-')
+
+# Created in the spool directory when the files written by earlier
+# versions have been renamed, see SpooledBuffer._migrate().
+MIGRATED = '.migrated'
+
+
 class SpooledBuffer(BaseBuffer):
     """A :class:`BaseBuffer` implementation that relies on the local
     filesystem to ensure that messages are not lost.
@@ -19,6 +35,12 @@ class SpooledBuffer(BaseBuffer):
     TODO: The persisting/loading of messages in their various states
     should be abstracted to a proper object model.
     """
+    #: The maximum number of tracked messages that are kept in memory.
+    tracked_size = 1024
+
+    # Both peek() and pop_many() scan the spool directory, and an empty
+    # transaction does not touch the storage medium.
+    peek_before_transfer = False
 
     @property
     def queued(self):
@@ -26,13 +48,15 @@ class SpooledBuffer(BaseBuffer):
 
     @property
     def deliveries(self):
-        return len(self._list_deliveries())
+        return self._count(self.abspath('deliveries'), '.dstate')
 
     @property
     def failed(self):
-        return len(list(glob.glob(self.abspath('*/*.amqp'))))
+        return self._count(self.abspath('rejected'), '.amqp')\
+            + self._count(self.abspath('undeliverable'), '.amqp')
 
     def __init__(self, spool='/var/spool/aorta'):
+        super(SpooledBuffer, self).__init__()
         self._spool = os.path.abspath(spool)
         self.logger = logging.getLogger()
         self.logger.info("Persisting in-transit messages to %s", spool)
@@ -44,22 +68,55 @@ class SpooledBuffer(BaseBuffer):
         os.makedirs(self.abspath('undeliverable'), exist_ok=True)
         os.makedirs(self.abspath('deliveries'), exist_ok=True)
 
+        # Queued messages are named after their not-before timestamp and
+        # a sequence number, so that the lexicographical order of the
+        # filenames is also the order in which they must be transmitted.
+        self._seq = itertools.count()
+
+        # Holds the (dir_fd, src, dst) tuples of the files that were written
+        # in the current transaction, or None if no transaction is active.
+        # If dst is None, src is removed when the transaction commits.
+        self._pending = None
+
+        # Recycled proton.Message instances, see release().
+        self._pool = MessagePool()
+
+        # The most recently tracked messages by their delivery tag, so
+        # that settlement usually does not have to read the delivery
+        # state from disk. See get().
+        self._tracked = collections.OrderedDict()
+
+        # Keep the directories open, so that files are created, renamed
+        # and removed relative to their file descriptor instead of
+        # resolving the full path on every system call.
+        flags = os.O_RDONLY|os.O_DIRECTORY|os.O_CLOEXEC
+        self._dir_fd = os.open(self._spool, flags)
+        self._deliveries_fd = os.open(self.abspath('deliveries'), flags)
+        self._rejected_fd = os.open(self.abspath('rejected'), flags)
+        self._undeliverable_fd = os.open(self.abspath('undeliverable'),
+            flags)
+        self._migrate()
+
     def abspath(self, *args):
         """Return the absolute path in the spool directory."""
         return os.path.join(self._spool, *args)
 
     def get(self, tag):
         """Return a :class:`proton.Message` instance by its
-        delivery tag.
+        delivery tag. A message that was tracked recently is
+        returned from memory the first time it is requested.
         """
-        src = self.abspath('deliveries', '%s.dstate' % str(tag))
-        if not os.path.exists(src):
+        message = self._tracked.pop(str(tag), None)
+        if message is not None:
+            return message
+        try:
+            fd = os.open('%s.dstate' % str(tag), os.O_RDONLY,
+                dir_fd=self._deliveries_fd)
+        except FileNotFoundError:
             raise LookupError
 
-        message = proton.Message()
-        with open(src, 'rb') as f:
-            message.decode(f.read())
-
+        message = self._message()
+        message.decode(self._read(fd))
         return message
 
     def enqueue(self, message, qat, nbf):
@@ -74,37 +131,78 @@ class SpooledBuffer(BaseBuffer):
 
         Returns:
             None
-        """
-        dst = self.abspath('%s.tmp' % str(message.id))
-        with open(dst, 'wb') as f:
-            f.write(nbf.to_bytes(8, 'big'))
-            f.write(message.encode())
-            f.flush()
-            os.fsync(f.fileno())
 
-        os.rename(dst, self.abspath('%s.amqp' % str(message.id)))
+        Messages that are not flagged as durable are not synced to
+        the storage medium and may be lost if the system crashes.
+        """
+        name = '%016x-%08x-%s' % (nbf, next(self._seq) & 0xffffffff,
+            str(message.id))
+        self._persist(self._dir_fd, name, '.amqp',
+            NBF.pack(nbf), message.encode(), durable=message.durable)
 
     def pop(self):
         """Return the next :class:`proton.Message` instance
         that is queued for transmission. This may delete the
         message data from the persistent storage medium.
         """
-        now = aorta.lib.timezone.now()
-        message = None
-        for filename in self._list_queued():
-            # The first eight bytes of the file contain the not-before
-            # timestamp, as milliseconds since the UNIX epoch.
-            with open(filename, 'rb') as f:
-                nbf = int.from_bytes(f.read(8), 'big')
-                if nbf > now:
-                    continue
-                message = proton.Message()
-                message.decode(f.read())
+        messages = self.pop_many(1)
+        return messages[0] if messages else None
 
-            os.unlink(filename)
-            break
+    def peek(self, now):
+        """Return a boolean indicating if the queue holds a message that
+        may be transmitted at `now`. Only the filenames are inspected.
+        """
+        with os.scandir(self._spool) as it:
+            names = [e.name for e in it if e.name.endswith('.amqp')]
+        queued = [x for x in names if QUEUED_NAME.match(x)]
+        if len(queued) < len(names):
+            # The not-before timestamp of files that are not named after
+            # it is unknown, so they may be ready for transmission.
+            return True
+        return bool(queued) and int(min(queued)[:16], 16) <= now
+
+    def pop_many(self, n):
+        """Return a list containing at most `n` :class:`proton.Message`
+        instances that are queued for transmission. The spool directory
+        is scanned only once.
+
+        The files of the returned messages are removed when the
+        transaction commits, after the files written in the same
+        transaction (e.g. the delivery states) are persisted. If the
+        transaction is rolled back, the messages remain queued.
+        """
+        with self.transaction():
+            return self._pop_many(n)
 
-        return message
+    def _pop_many(self, n):
+        now = aorta.lib.timezone.now()
+        removed = set(src for dir_fd, src, dst in self._pending
+            if dst is None)
+        messages = []
+        for filename in self._list_queued():
+            if len(messages) >= n:
+                break
+            if filename in removed:
+                continue
+
+            # The filename starts with the not-before timestamp, as
+            # hexadecimal milliseconds since the UNIX epoch. Since the
+            # filenames are sorted, all subsequent messages are also
+            # not ready for transmission.
+            nbf = int(filename[:16], 16)
+            if nbf > now:
+                break
+
+            # The file starts with a header repeating the not-before
+            # timestamp.
+            fd = os.open(filename, os.O_RDONLY, dir_fd=self._dir_fd)
+            message = self._message()
+            message.decode(self._read(fd, NBF.size))
+
+            self._pending.append((self._dir_fd, filename, None))
+            messages.append(message)
+
+        return messages
 
     def track(self, host, port, source, target, link, tag, message):
         """Track the delivery of `message` to the AMQP remote peer.
@@ -121,13 +219,32 @@ class SpooledBuffer(BaseBuffer):
         Returns:
             None
         """
-        dst = self.abspath('deliveries', '%s.tmp' % str(tag))
-        with open(dst, 'wb') as f:
-            f.write(message.encode())
-            f.flush()
-            os.fsync(f.fileno())
+        self._persist(self._deliveries_fd, str(tag), '.dstate',
+            message.encode())
+        self._tracked[str(tag)] = message
+        if len(self._tracked) > self.tracked_size:
+            self._tracked.popitem(last=False)
+
+    def track_many(self, host, port, source, target, link, deliveries):
+        """Track the delivery of multiple messages to the AMQP remote
+        peer. All delivery states are written in a single transaction,
+        so that they are committed with one sync instead of invoking
+        :func:`os.fsync()` for each delivery.
 
-        os.rename(dst, dst.replace('.tmp','.dstate'))
+        Args:
+            host (str): IP address of the AMQP peer.
+            port (int): port at which the AMQP peer is listening.
+            source (str): source name, if applicable.
+            target (str): target name, if applicable.
+            link (str): link identifier.
+            deliveries (list): a list of ``(tag, message)`` tuples.
+
+        Returns:
+            None
+        """
+        with self.transaction():
+            super(SpooledBuffer, self).track_many(host, port, source,
+                target, link, deliveries)
 
     def on_accepted(self, delivery, message, disposition):
         """Invoked when the remote has indicated that it accepts the message.
@@ -142,8 +259,15 @@ class SpooledBuffer(BaseBuffer):
         Returns:
             None
         """
-        filename = self.abspath('deliveries', '%s.dstate' % delivery.tag)
-        os.unlink(filename)
+        os.unlink('%s.dstate' % delivery.tag, dir_fd=self._deliveries_fd)
+        self.release(message)
+
+    def release(self, message):
+        """Return `message` to the pool of :class:`proton.Message`
+        instances that are reused by :meth:`get()` and :meth:`pop()`.
+        The caller must not use `message` afterwards.
+        """
+        self._pool.release(message)
 
     def error(self, tag, message, undeliverable=False):
         """Invoked when a message could not be delivered.
@@ -160,25 +284,201 @@ class SpooledBuffer(BaseBuffer):
         Returns:
             None
         """
-        dst = self.abspath('undeliverable' if undeliverable else 'rejected',
-            '%s.tmp' % message.id)
-        with open(dst, 'wb') as f:
-            f.write((0).to_bytes(8, 'big'))
-            f.write(message.encode())
-            f.flush()
-            os.fsync(f.fileno())
-
-        os.rename(dst, dst.replace('.tmp','.amqp'))
+        dir_fd = self._undeliverable_fd if undeliverable\
+            else self._rejected_fd
+        self._persist(dir_fd, str(message.id), '.amqp',
+            NBF.pack(0), message.encode())
+
+    @contextlib.contextmanager
+    def transaction(self):
+        """Start a transaction. Files written during the transaction
+        are not synced individually; instead, :meth:`commit()` is invoked
+        when the context exits, so that the durability of all files is
+        ensured at once. If an exception occurs, the files are discarded
+        and the files scheduled for removal are kept. Nested transactions
+        are part of the outer transaction.
+        """
+        if self._pending is not None:
+            yield
+            return
+
+        self._pending = []
+        try:
+            yield
+            self.commit()
+        except Exception:
+            # Files that were already renamed by an interrupted commit()
+            # are kept.
+            for dir_fd, src, dst in self._pending:
+                if dst is not None:
+                    try:
+                        os.unlink(src, dir_fd=dir_fd)
+                    except FileNotFoundError:
+                        pass
+
+            # The delivery states written in this transaction are gone,
+            # so the tracked messages may not be returned by get().
+            self._tracked.clear()
+            raise
+        finally:
+            self._pending = None
+
+    def commit(self):
+        """Ensure that all files written in the current transaction are
+        persisted and move them to their final location, then remove the
+        files that were scheduled for removal. Each written file is synced
+        with :func:`os.fsync()` before any file is renamed, and the
+        containing directories are synced once after the files are
+        renamed, and once after the files are removed.
+        """
+        if not self._pending:
+            return
+
+        written = [x for x in self._pending if x[2] is not None]
+        removed = [x for x in self._pending if x[2] is None]
+        for dir_fd, src, dst in written:
+            fd = os.open(src, os.O_RDONLY, dir_fd=dir_fd)
+            try:
+                os.fsync(fd)
+            finally:
+                os.close(fd)
+
+        for dir_fd in self._apply(written):
+            os.fsync(dir_fd)
+        for dir_fd in self._apply(removed):
+            os.fsync(dir_fd)
+        self._pending = []
+
+    def close(self):
+        """Close the directory file descriptors held by the buffer."""
+        for attname in ('_dir_fd', '_deliveries_fd', '_rejected_fd',
+            '_undeliverable_fd'):
+            fd = getattr(self, attname, None)
+            if fd is not None:
+                os.close(fd)
+                setattr(self, attname, None)
+
+    def __del__(self):
+        # Buffers that are not closed explicitly, e.g. those created by
+        # EventPublisher, must not leak their file descriptors.
+        self.close()
+
+    def _apply(self, pending):
+        # Rename or remove the files in pending and return the set of
+        # directories that were modified.
+        dir_fds = set()
+        for dir_fd, src, dst in pending:
+            if dst is not None:
+                os.rename(src, dst, src_dir_fd=dir_fd, dst_dir_fd=dir_fd)
+            else:
+                os.unlink(src, dir_fd=dir_fd)
+            dir_fds.add(dir_fd)
+        return dir_fds
+
+    def _persist(self, dir_fd, name, ext, *chunks, durable=True):
+        # Write the chunks to a temporary file in dir_fd and rename it to
+        # name + ext. In a transaction, syncing and renaming is deferred
+        # until commit(). The chunks are submitted to the kernel with a
+        # single writev() call. Non-durable files are renamed immediately
+        # and never synced.
+        src = '%s.tmp' % name
+        dst = name + ext
+        fd = os.open(src, os.O_WRONLY|os.O_CREAT|os.O_TRUNC, 0o666,
+            dir_fd=dir_fd)
+        try:
+            size = sum(len(chunk) for chunk in chunks)
+            n = os.writev(fd, chunks)
+            if n < size:
+                data = b''.join(chunks)
+                while n < size:
+                    n += os.write(fd, data[n:])
+            if durable and self._pending is None:
+                os.fsync(fd)
+        finally:
+            os.close(fd)
+
+        if not durable or self._pending is None:
+            os.rename(src, dst, src_dir_fd=dir_fd, dst_dir_fd=dir_fd)
+        else:
+            self._pending.append((dir_fd, src, dst))
+
+    def _migrate(self):
+        # Rename queued messages that were written by earlier versions,
+        # which named the files after the message identifier only. The
+        # not-before timestamp is read from the header of the file, and
+        # the files are renamed in the order of their modification time,
+        # which is the order in which earlier versions transmitted them.
+        # Other processes sharing the spool may migrate the same files
+        # concurrently, so files that disappear are skipped. The spool
+        # directory is only scanned until the migration has completed
+        # once.
+        try:
+            os.stat(MIGRATED, dir_fd=self._dir_fd)
+            return
+        except FileNotFoundError:
+            pass
+
+        items = []
+        with os.scandir(self._spool) as it:
+            for entry in it:
+                if not entry.name.endswith('.amqp')\
+                or QUEUED_NAME.match(entry.name):
+                    continue
+                try:
+                    items.append((entry.stat().st_mtime, entry.name))
+                except FileNotFoundError:
+                    continue
+        items.sort()
+
+        n = 0
+        for mtime, filename in items:
+            try:
+                fd = os.open(filename, os.O_RDONLY, dir_fd=self._dir_fd)
+            except FileNotFoundError:
+                continue
+            try:
+                nbf, = NBF.unpack(os.pread(fd, NBF.size, 0))
+            finally:
+                os.close(fd)
+            name = '%016x-%08x-%s' % (nbf, next(self._seq) & 0xffffffff,
+                filename)
+            try:
+                os.rename(filename, name, src_dir_fd=self._dir_fd,
+                    dst_dir_fd=self._dir_fd)
+            except FileNotFoundError:
+                continue
+            n += 1
+
+        os.close(os.open(MIGRATED, os.O_WRONLY|os.O_CREAT, 0o666,
+            dir_fd=self._dir_fd))
+        os.fsync(self._dir_fd)
+        if n:
+            self.logger.info("Renamed %s queued messages in %s", n,
+                self._spool)
+
+    def _read(self, fd, offset=0):
+        # Read the contents of fd, starting at offset, with a single
+        # pread() into an exactly sized bytes object, and close it.
+        try:
+            size = os.fstat(fd).st_size - offset
+            return os.pread(fd, size, offset)
+        finally:
+            os.close(fd)
+
+    def _message(self):
+        # Return a recycled proton.Message instance, if available.
+        return self._pool.acquire()
 
     def _list_queued(self):
-        files = glob.glob(os.path.join(self._spool, '*.amqp'))
-        files.sort(key=os.path.getmtime)
-        return list(files)
+        with os.scandir(self._spool) as it:
+            files = [e.name for e in it
+                if e.name.endswith('.amqp') and e.is_file()]
+        files.sort()
+        return files
 
-    def _list_deliveries(self):
-        files = glob.glob(os.path.join(self._spool, 'deliveries/*.dstate'))
-        files.sort(key=os.path.getmtime)
-        return list(files)
+    def _count(self, path, suffix):
+        with os.scandir(path) as it:
+            return sum(1 for e in it if e.name.endswith(suffix))
 
     def __len__(self):
-        return len(self._list_queued())
+        return self._count(self._spool, '.amqp')
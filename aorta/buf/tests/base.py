@@ -16,6 +16,10 @@ class BaseBufferImplementationTestCase(unittest.TestCase):
     """
     __test__ = False
     message_classes = (Message,)
+
+    #: Indicates if the implementation rolls back a transaction when an
+    #: exception occurs.
+    transactional = True
     ACCEPTED = Disposition.ACCEPTED
     REJECTED = Disposition.REJECTED
     RELEASED = Disposition.RELEASED
@@ -30,6 +34,7 @@ class BaseBufferImplementationTestCase(unittest.TestCase):
         message.correlation_id = uuid.UUID(bytes=os.urandom(16))
         message.delivery_count = 0
         message.creation_time = timezone.now()
+        message.durable = True
         return message
 
     def test_put_increases_count_by_one(self):
@@ -38,6 +43,31 @@ class BaseBufferImplementationTestCase(unittest.TestCase):
         self.buf.put(self.random_message())
         self.assertEqual(n + 1, len(self.buf))
 
+    def test_enqueue_many_increases_count(self):
+        """enqueue_many() queues all messages."""
+        n = len(self.buf)
+        qat, nbf = self.buf.delay()
+        self.buf.enqueue_many(
+            [self.random_message(), self.random_message()], qat, nbf)
+        self.assertEqual(n + 2, len(self.buf))
+
+    def test_put_many_increases_count(self):
+        n = len(self.buf)
+        self.buf.put_many([self.random_message(), self.random_message()])
+        self.assertEqual(n + 2, len(self.buf))
+
+    def test_put_invokes_on_settled(self):
+        message = self.random_message()
+        settled = []
+        self.buf.put(message, on_settled=settled.append)
+        self.assertEqual(settled, [message])
+
+    def test_put_many_invokes_on_settled_for_each_message(self):
+        messages = [self.random_message(), self.random_message()]
+        settled = []
+        self.buf.put_many(messages, on_settled=settled.append)
+        self.assertEqual(settled, messages)
+
     def test_pop_decreases_count(self):
         """Invoking pop() must decrease the queued message count
         by one.
@@ -69,6 +99,141 @@ class BaseBufferImplementationTestCase(unittest.TestCase):
         time.sleep(0.05)
         self.assertIsInstance(self.buf.pop(), self.message_classes)
 
+    def test_pop_skips_messages_with_nbf_in_future(self):
+        """pop() must return a ready message even if it was queued after
+        a message that has a not-before timestamp in the future.
+        """
+        m1 = self.random_message()
+        m2 = self.random_message()
+        self.buf.put(m1, delay=5000)
+        self.buf.put(m2)
+        self.assertEqual(self.buf.pop().id, m2.id)
+        self.assertEqual(self.buf.pop(), None)
+
+    def test_peek_returns_false_if_empty(self):
+        self.assertFalse(self.buf.peek(self.buf.now()))
+
+    def test_peek_returns_false_if_nbf_in_future(self):
+        self.buf.put(self.random_message(), delay=5000)
+        self.assertFalse(self.buf.peek(self.buf.now()))
+
+    def test_peek_returns_true_if_message_is_ready(self):
+        self.buf.put(self.random_message(), delay=5000)
+        self.buf.put(self.random_message())
+        self.assertTrue(self.buf.peek(self.buf.now()))
+
+    def test_pop_many_returns_at_most_n_messages(self):
+        """pop_many() must not return more messages than requested."""
+        for i in range(3):
+            self.buf.put(self.random_message())
+        self.assertEqual(len(self.buf.pop_many(2)), 2)
+        self.assertEqual(len(self.buf), 1)
+
+    def test_pop_many_does_not_return_nbf_in_future(self):
+        """pop_many() must not return messages that have a not-before
+        timestamp in the future.
+        """
+        self.buf.put(self.random_message())
+        self.buf.put(self.random_message(), delay=5000)
+        self.assertEqual(len(self.buf.pop_many(2)), 1)
+        self.assertEqual(len(self.buf), 1)
+
+    def test_pop_many_preserves_ordering(self):
+        m1 = self.random_message()
+        m2 = self.random_message()
+        self.buf.put(m1)
+        self.buf.put(m2)
+        messages = self.buf.pop_many(2)
+        self.assertEqual([m.id for m in messages], [m1.id, m2.id])
+
+    def test_pop_in_transaction_is_kept_on_exception(self):
+        """Messages popped in a transaction must remain queued if the
+        transaction is rolled back.
+        """
+        if not self.transactional:
+            self.skipTest("Implementation is not transactional.")
+        m1 = self.random_message()
+        self.buf.put(m1)
+        with self.assertRaises(ValueError):
+            with self.buf.transaction():
+                self.assertIsNotNone(self.buf.pop())
+                raise ValueError
+        self.assertEqual(len(self.buf), 1)
+        self.assertEqual(self.buf.pop().id, m1.id)
+
+    def test_put_in_transaction_is_discarded_on_exception(self):
+        """Messages enqueued in a transaction must not remain queued if
+        the transaction is rolled back.
+        """
+        if not self.transactional:
+            self.skipTest("Implementation is not transactional.")
+        m1 = self.random_message()
+        self.buf.put(m1)
+        with self.assertRaises(ValueError):
+            with self.buf.transaction():
+                self.buf.put(self.random_message())
+                self.buf.put(self.random_message())
+                raise ValueError
+        self.assertEqual(len(self.buf), 1)
+        self.assertEqual(self.buf.pop().id, m1.id)
+        self.assertEqual(self.buf.pop(), None)
+
+    def test_transfer_batch_is_bounded_by_credit(self):
+        """transfer_batch() must not send more messages than the sender
+        has credit for.
+        """
+        self.sender.credit = 2
+        for i in range(3):
+            self.buf.put(self.random_message())
+        tags = self.buf.transfer_batch('127.0.0.1:8000', 'local', 'remote',
+            self.sender)
+        self.assertEqual(len(tags), 2)
+        self.assertEqual(len(self.buf), 1)
+
+    def test_transfer_batch_consumes_all_credit_without_limit(self):
+        self.sender.credit = 3
+        for i in range(5):
+            self.buf.put(self.random_message())
+        tags = self.buf.transfer_batch('127.0.0.1:8000', 'local', 'remote',
+            self.sender)
+        self.assertEqual(len(tags), 3)
+        self.assertEqual(self.buf.deliveries, 3)
+
+    def test_transfer_batch_is_bounded_by_limit(self):
+        self.sender.credit = 10
+        for i in range(3):
+            self.buf.put(self.random_message())
+        tags = self.buf.transfer_batch('127.0.0.1:8000', 'local', 'remote',
+            self.sender, limit=1)
+        self.assertEqual(len(tags), 1)
+        self.assertEqual(len(self.buf), 2)
+
+    def test_transfer_batch_tracks_deliveries(self):
+        self.sender.credit = 10
+        m1 = self.random_message()
+        m2 = self.random_message()
+        self.buf.put(m1)
+        self.buf.put(m2)
+        tags = self.buf.transfer_batch('127.0.0.1:8000', 'local', 'remote',
+            self.sender, channel='foo')
+        self.assertEqual(self.buf.deliveries, 2)
+        self.assertEqual(self.buf.get(tags[0]).id, m1.id)
+        self.assertEqual(self.buf.get(tags[1]).address, 'foo')
+
+    def test_transfer_batch_without_credit_returns_empty_list(self):
+        self.sender.credit = 0
+        self.buf.put(self.random_message())
+        tags = self.buf.transfer_batch('127.0.0.1:8000', 'local', 'remote',
+            self.sender)
+        self.assertEqual(tags, [])
+        self.assertEqual(len(self.buf), 1)
+
+    def test_transfer_batch_handles_no_message_correctly(self):
+        tags = self.buf.transfer_batch('127.0.0.1:8000', 'local', 'remote',
+            self.sender)
+        self.assertEqual(tags, [])
+        self.assertEqual(self.buf.deliveries, 0)
+
     def test_transfer_exits_if_sender_has_no_credit(self):
         """transfer() does nothing if the sender has no credit."""
         self.sender.credit = 0
@@ -95,6 +260,18 @@ class BaseBufferImplementationTestCase(unittest.TestCase):
         self.buf.transfer('127.0.0.1:8000', 'local', 'remote', self.sender)
         self.assertEqual(n - 1, len(self.buf))
 
+    def test_transfer_removes_one_message_from_queue_with_two_queued(self):
+        """transfer() must not pop more than one message from the queue."""
+        m1 = self.random_message()
+        self.buf.put(m1)
+        self.buf.put(self.random_message())
+        n = len(self.buf)
+
+        tag = self.buf.transfer('127.0.0.1:8000', 'local', 'remote',
+            self.sender)
+        self.assertEqual(n - 1, len(self.buf))
+        self.assertEqual(self.buf.get(tag).id, m1.id)
+
     def test_transfer_sets_channel(self):
         """transfer() removes one message from the queue."""
         self.buf.put(self.random_message())
@@ -343,6 +520,23 @@ class BaseBufferImplementationTestCase(unittest.TestCase):
         self.buf.on_settled(delivery, self.MODIFIED,
             Disposition(False))
 
+    def test_accepted_outcome_removes_delivery(self):
+        self.buf.put(self.random_message())
+        tag = self.buf.transfer('127.0.0.1:5672', 'local','remote',
+            self.sender)
+        delivery = Delivery(tag=tag, link=self.sender)
+        self.buf.on_settled(delivery, self.ACCEPTED,
+            Disposition(False))
+        self.assertEqual(self.buf.deliveries, 0)
+
+    def test_unknown_outcome_is_ignored(self):
+        self.buf.put(self.random_message())
+        tag = self.buf.transfer('127.0.0.1:5672', 'local','remote',
+            self.sender)
+        delivery = Delivery(tag=tag, link=self.sender)
+        self.buf.on_settled(delivery, None, Disposition(False))
+        self.assertEqual(self.buf.deliveries, 1)
+
 
 Disposition = collections.namedtuple('Disposition', ['undeliverable'])
 
@@ -1,4 +1,5 @@
 import datetime
+import itertools
 import unittest
 
 from ..base import BaseBuffer
@@ -18,10 +19,91 @@ class BaseBufferTestCase(unittest.TestCase):
         self.assertLess(qat, nbf)
         self.assertEqual(qat, nbf - 300000)
 
+    def test_backoff_grows_exponentially(self):
+        self.assertEqual(self.buf.backoff(0), 5000)
+        self.assertEqual(self.buf.backoff(1), 6250)
+        self.assertEqual(self.buf.backoff(40),
+            int(self.buf.initial_backoff * (1.25**40)))
+
+    def test_backoff_follows_initial_backoff(self):
+        self.buf.backoff(0)
+        self.buf.initial_backoff = 1000
+        self.assertEqual(self.buf.backoff(0), 1000)
+        self.assertEqual(self.buf.backoff(1), 1250)
+
+    def test_generate_tag_returns_unique_tags(self):
+        tags = set([self.buf.generate_tag() for i in range(100)])
+        self.assertEqual(len(tags), 100)
+
+    def test_generate_tag_differs_between_instances(self):
+        self.assertNotEqual(self.buf.generate_tag(),
+            BaseBuffer().generate_tag())
+
+    def test_generate_tag_returns_32_hex_characters(self):
+        tag = self.buf.generate_tag()
+        self.assertEqual(len(tag), 32)
+        int(tag, 16)
+
+    def test_generate_tag_draws_new_prefix_when_counter_wraps(self):
+        self.buf._tag_counter = itertools.count(0xffffffff)
+        t1 = self.buf.generate_tag()
+        t2 = self.buf.generate_tag()
+        self.assertTrue(t1.endswith('ffffffff'))
+        self.assertTrue(t2.endswith('00000000'))
+        self.assertNotEqual(t1[:24], t2[:24])
+        self.assertTrue(self.buf.generate_tag().endswith('00000001'))
+
+    def test_generate_tag_draws_new_prefix_after_fork(self):
+        t1 = self.buf.generate_tag()
+        self.buf._tag_pid = -1
+        t2 = self.buf.generate_tag()
+        self.assertNotEqual(t1[:24], t2[:24])
+        self.assertTrue(t2.endswith('00000000'))
+
+    def test_peek_returns_true(self):
+        self.assertTrue(self.buf.peek(0))
+
+    def test_release_does_nothing(self):
+        self.buf.release(None)
+
+    def test_close_does_nothing(self):
+        self.buf.close()
+
+    def test_parse_host_returns_addr_and_port(self):
+        self.assertEqual(self.buf.parse_host('127.0.0.1:5672'),
+            ('127.0.0.1', '5672'))
+
+    def test_parse_host_returns_cached_result(self):
+        self.assertIs(self.buf.parse_host('127.0.0.1:5672'),
+            self.buf.parse_host('127.0.0.1:5672'))
+
+    def test_parse_host_rejects_invalid_port(self):
+        with self.assertRaises(AssertionError):
+            self.buf.parse_host('127.0.0.1:foo')
+
     def test_pop_raises_notimplementederror(self):
         with self.assertRaises(NotImplementedError):
             self.buf.pop()
 
+    def test_pop_many_raises_notimplementederror(self):
+        with self.assertRaises(NotImplementedError):
+            self.buf.pop_many(1)
+
+    def test_pop_many_invokes_pop_until_exhausted(self):
+        messages = [1, 2]
+        self.buf.pop = lambda: messages.pop(0) if messages else None
+        self.assertEqual(self.buf.pop_many(3), [1, 2])
+
+    def test_pop_many_invokes_pop_at_most_n_times(self):
+        messages = [1, 2]
+        self.buf.pop = lambda: messages.pop(0) if messages else None
+        self.assertEqual(self.buf.pop_many(1), [1])
+        self.assertEqual(messages, [2])
+
+    def test_track_many_raises_notimplementederror(self):
+        with self.assertRaises(NotImplementedError):
+            self.buf.track_many(None, None, None, None, None, [(None, None)])
+
     def test_get_raises_notimplementederror(self):
         with self.assertRaises(NotImplementedError):
             self.buf.get(None)
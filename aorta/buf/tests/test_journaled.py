@@ -0,0 +1,156 @@
+import os
+import tempfile
+import unittest
+
+from ..journaled import JournaledBuffer
+from ..journaled import RECORD
+from ..journaled import R_ENQUEUE
+from ..spooled import SpooledBuffer
+from .base import BaseBufferImplementationTestCase
+
+
+class JournaledBufferImplementationTestCase(BaseBufferImplementationTestCase):
+    __test__ = True
+
+    def setUp(self):
+        super(JournaledBufferImplementationTestCase, self).setUp()
+        self.spool = tempfile.mkdtemp()
+        self.buf = JournaledBuffer(spool=self.spool)
+
+    def tearDown(self):
+        self.buf.close()
+
+    def reopen(self, **kwargs):
+        self.buf.close()
+        self.buf = JournaledBuffer(spool=self.spool, **kwargs)
+        return self.buf
+
+    def segments(self):
+        return sorted(os.listdir(self.buf.abspath('journal')))
+
+    def test_queue_is_restored_from_journal(self):
+        m1 = self.random_message()
+        m2 = self.random_message()
+        self.buf.put(m1)
+        self.buf.put(m2)
+        self.reopen()
+        self.assertEqual(len(self.buf), 2)
+        self.assertEqual(self.buf.pop().id, m1.id)
+
+    def test_popped_message_is_not_restored(self):
+        m1 = self.random_message()
+        m2 = self.random_message()
+        self.buf.put(m1)
+        self.buf.put(m2)
+        self.buf.pop()
+        self.reopen()
+        self.assertEqual(len(self.buf), 1)
+        self.assertEqual(self.buf.pop().id, m2.id)
+
+    def test_incomplete_record_is_truncated(self):
+        self.buf.put(self.random_message())
+        path = self.buf.abspath('journal', self.segments()[-1])
+        size = os.path.getsize(path)
+        with open(path, 'ab') as f:
+            f.write(b'\x01\x00\x00')
+        self.reopen()
+        self.assertEqual(len(self.buf), 1)
+        self.assertEqual(os.path.getsize(path), size)
+
+    def test_incomplete_payload_is_truncated(self):
+        self.buf.put(self.random_message())
+        path = self.buf.abspath('journal', self.segments()[-1])
+        size = os.path.getsize(path)
+        with open(path, 'ab') as f:
+            f.write(RECORD.pack(R_ENQUEUE, 0, 16) + b'\x00')
+        self.reopen()
+        self.assertEqual(len(self.buf), 1)
+        self.assertEqual(os.path.getsize(path), size)
+
+    def test_segments_are_rotated(self):
+        self.reopen(segment_size=1)
+        self.buf.put(self.random_message())
+        self.buf.put(self.random_message())
+        self.assertEqual(len(self.segments()), 2)
+
+    def test_drained_segments_are_removed(self):
+        self.reopen(segment_size=1)
+        self.buf.put(self.random_message())
+        self.buf.put(self.random_message())
+        self.buf.pop()
+        self.assertEqual(len(self.segments()), 1)
+        self.reopen(segment_size=1)
+        self.assertEqual(len(self.buf), 1)
+
+    def test_compact_removes_inactive_segments(self):
+        self.reopen(segment_size=1)
+        m1 = self.random_message()
+        self.buf.put(m1)
+        self.buf.put(self.random_message())
+        self.buf.compact()
+        self.assertEqual(len(self.segments()), 1)
+        self.reopen()
+        self.assertEqual(len(self.buf), 2)
+        self.assertEqual(self.buf.pop().id, m1.id)
+
+    def test_pop_writes_tombstone_on_commit(self):
+        self.buf.put(self.random_message())
+        with self.buf.transaction():
+            self.buf.pop()
+            self.assertEqual(len(self.buf._popped), 1)
+        self.assertEqual(self.buf._popped, [])
+        self.reopen()
+        self.assertEqual(len(self.buf), 0)
+
+    def test_popped_message_is_restored_on_exception(self):
+        self.buf.put(self.random_message())
+        with self.assertRaises(ValueError):
+            with self.buf.transaction():
+                self.buf.pop()
+                raise ValueError
+        self.reopen()
+        self.assertEqual(len(self.buf), 1)
+
+    def test_buffer_is_compacted_when_segments_exceed_maximum(self):
+        self.reopen(segment_size=1, max_segments=2)
+        m1 = self.random_message()
+        self.buf.put(m1, delay=5000)
+        for i in range(3):
+            self.buf.put(self.random_message())
+        self.assertEqual(len(self.segments()), 4)
+        self.buf.pop_many(3)
+        self.assertEqual(len(self.segments()), 1)
+        self.reopen()
+        self.assertEqual(len(self.buf), 1)
+
+    def test_spooled_messages_are_imported(self):
+        self.buf.close()
+        buf = SpooledBuffer(spool=self.spool)
+        m1 = self.random_message()
+        buf.put(m1)
+        buf.put(self.random_message(), delay=5000)
+        buf.close()
+        self.reopen()
+        self.assertEqual(len(self.buf), 2)
+        self.assertEqual(self.buf._list_queued(), [])
+        self.assertEqual(self.buf.pop().id, m1.id)
+        self.reopen()
+        self.assertEqual(len(self.buf), 1)
+
+    def test_put_in_transaction_is_not_restored_on_exception(self):
+        with self.assertRaises(ValueError):
+            with self.buf.transaction():
+                self.buf.put(self.random_message())
+                raise ValueError
+        self.reopen()
+        self.assertEqual(len(self.buf), 0)
+
+    def test_put_and_pop_in_transaction_is_discarded_on_exception(self):
+        with self.assertRaises(ValueError):
+            with self.buf.transaction():
+                self.buf.put(self.random_message())
+                self.assertIsNotNone(self.buf.pop())
+                raise ValueError
+        self.assertEqual(len(self.buf), 0)
+        self.reopen()
+        self.assertEqual(len(self.buf), 0)
@@ -6,6 +6,7 @@ from .base import BaseBufferImplementationTestCase
 
 class NullBufferImplementationTestCase(BaseBufferImplementationTestCase):
     __test__ = True
+    transactional = False
 
     def setUp(self):
         super(NullBufferImplementationTestCase, self).setUp()
@@ -1,5 +1,8 @@
+import gc
+import os
 import tempfile
 import unittest
+import unittest.mock
 
 from ..spooled import SpooledBuffer
 from .base import BaseBufferImplementationTestCase
@@ -12,3 +15,183 @@ class SpooledBufferImplementationTestCase(BaseBufferImplementationTestCase):
         super(SpooledBufferImplementationTestCase, self).setUp()
         self.buf = SpooledBuffer(spool=tempfile.mkdtemp())
 
+    def tearDown(self):
+        self.buf.close()
+
+    def test_enqueue_prefixes_filename_with_nbf(self):
+        self.buf.enqueue(self.random_message(), 0, 255)
+        filename, = self.buf._list_queued()
+        self.assertTrue(filename.startswith('00000000000000ff-'))
+
+    def test_enqueue_in_transaction_is_deferred_until_commit(self):
+        with self.buf.transaction():
+            self.buf.put(self.random_message())
+            self.buf.put(self.random_message())
+            self.assertEqual(len(self.buf), 0)
+        self.assertEqual(len(self.buf), 2)
+
+    def test_transaction_discards_files_on_exception(self):
+        with self.assertRaises(ValueError):
+            with self.buf.transaction():
+                self.buf.put(self.random_message())
+                raise ValueError
+        self.assertEqual(len(self.buf), 0)
+        self.assertEqual(
+            [x for x in os.listdir(self.buf.abspath()) if x.endswith('.tmp')],
+            [])
+
+    def test_released_message_is_reused(self):
+        message = self.random_message()
+        self.buf.release(message)
+        self.buf.put(self.random_message())
+        self.assertIs(self.buf.pop(), message)
+
+    def test_non_durable_enqueue_in_transaction_is_not_deferred(self):
+        message = self.random_message()
+        message.durable = False
+        with self.buf.transaction():
+            self.buf.put(message)
+            self.assertEqual(len(self.buf), 1)
+
+    def test_pop_many_in_transaction_does_not_return_popped(self):
+        self.buf.put(self.random_message())
+        self.buf.put(self.random_message())
+        with self.buf.transaction():
+            m1 = self.buf.pop()
+            m2 = self.buf.pop()
+            self.assertNotEqual(m1.id, m2.id)
+            self.assertEqual(self.buf.pop(), None)
+        self.assertEqual(len(self.buf), 0)
+
+    def test_get_returns_tracked_message_from_memory(self):
+        self.buf.put(self.random_message())
+        tag = self.buf.transfer('127.0.0.1:5672', 'local', 'remote',
+            self.sender)
+        message = self.buf.get(tag)
+        self.assertIs(self.buf._tracked.get(tag), None)
+        self.assertEqual(self.buf.get(tag).id, message.id)
+
+    def test_tracked_messages_are_bounded(self):
+        self.buf.tracked_size = 1
+        self.buf.put(self.random_message())
+        self.buf.put(self.random_message())
+        self.sender.credit = 2
+        tags = self.buf.transfer_batch('127.0.0.1:5672', 'local', 'remote',
+            self.sender)
+        self.assertEqual(list(self.buf._tracked), tags[1:])
+        self.assertIsNotNone(self.buf.get(tags[0]))
+
+    def test_tracked_messages_are_discarded_on_exception(self):
+        self.buf.put(self.random_message())
+        with self.assertRaises(ValueError):
+            with self.buf.transaction():
+                self.buf.transfer('127.0.0.1:5672', 'local', 'remote',
+                    self.sender)
+                raise ValueError
+        self.assertEqual(len(self.buf._tracked), 0)
+        self.assertEqual(self.buf.deliveries, 0)
+
+    def write_legacy(self, spool, nbf, message, mtime):
+        path = os.path.join(spool, '%s.amqp' % message.id)
+        with open(path, 'wb') as f:
+            f.write(nbf.to_bytes(8, 'big') + message.encode())
+        os.utime(path, (mtime, mtime))
+
+    def test_legacy_filenames_are_renamed(self):
+        m1 = self.random_message()
+        m2 = self.random_message()
+        spool = tempfile.mkdtemp()
+        self.write_legacy(spool, 0, m1, 0)
+        self.write_legacy(spool, 2**50, m2, 1)
+        self.buf.close()
+        self.buf = SpooledBuffer(spool=spool)
+        filenames = self.buf._list_queued()
+        self.assertEqual(filenames[0], '%016x-%08x-%s.amqp' % (0, 0, m1.id))
+        self.assertTrue(filenames[1].startswith('%016x-' % 2**50))
+        self.assertTrue(self.buf.peek(self.buf.now()))
+        self.assertEqual(self.buf.pop().id, m1.id)
+        self.assertEqual(self.buf.pop(), None)
+
+    def test_migration_skips_vanished_files(self):
+        m1 = self.random_message()
+        m2 = self.random_message()
+        spool = tempfile.mkdtemp()
+        self.write_legacy(spool, 0, m1, 0)
+        self.write_legacy(spool, 0, m2, 1)
+
+        # Simulate another process that renames the first file before
+        # this process does.
+        rename = os.rename
+        def _rename(src, dst, **kwargs):
+            if src.startswith(str(m1.id)):
+                os.unlink(src, dir_fd=kwargs['src_dir_fd'])
+            return rename(src, dst, **kwargs)
+        self.buf.close()
+        with unittest.mock.patch('os.rename', _rename):
+            self.buf = SpooledBuffer(spool=spool)
+        self.assertEqual(len(self.buf), 1)
+        self.assertEqual(self.buf.pop().id, m2.id)
+
+    def test_migration_runs_once(self):
+        message = self.random_message()
+        self.write_legacy(self.buf.abspath(), 0, message, 0)
+        self.buf.close()
+        self.buf = SpooledBuffer(spool=self.buf.abspath())
+        self.assertEqual(self.buf._list_queued(), ['%s.amqp' % message.id])
+
+    def test_del_closes_file_descriptors(self):
+        buf = SpooledBuffer(spool=self.buf.abspath())
+        fd = buf._dir_fd
+        del buf
+        gc.collect()
+        with self.assertRaises(OSError):
+            os.fstat(fd)
+
+    def test_interrupted_commit_discards_files(self):
+        def _apply(pending):
+            raise OSError
+        self.buf._apply = _apply
+        with self.assertRaises(OSError):
+            with self.buf.transaction():
+                self.buf.put(self.random_message())
+                self.buf.put(self.random_message())
+        self.assertEqual(len(self.buf), 0)
+        self.assertEqual(
+            [x for x in os.listdir(self.buf.abspath()) if x.endswith('.tmp')],
+            [])
+
+    def test_interrupted_commit_keeps_renamed_files(self):
+        apply = self.buf._apply
+        def _apply(pending):
+            apply(pending)
+            raise OSError
+        self.buf._apply = _apply
+        with self.assertRaises(OSError):
+            with self.buf.transaction():
+                self.buf.put(self.random_message())
+                self.buf.put(self.random_message())
+        self.assertEqual(len(self.buf), 2)
+
+    def test_peek_returns_true_for_unprefixed_filenames(self):
+        self.buf.put(self.random_message(), delay=5000)
+        with open(self.buf.abspath('foo.amqp'), 'wb') as f:
+            f.write((0).to_bytes(8, 'big'))
+        self.assertTrue(self.buf.peek(self.buf.now()))
+
+    def test_transfer_batch_does_not_peek(self):
+        def peek(now):
+            raise AssertionError
+        self.buf.peek = peek
+        self.buf.put(self.random_message())
+        tags = self.buf.transfer_batch('127.0.0.1:5672', 'local', 'remote',
+            self.sender)
+        self.assertEqual(len(tags), 1)
+
+    def test_partial_writev_is_completed(self):
+        message = self.random_message()
+        write = os.write
+        def writev(fd, chunks):
+            return write(fd, chunks[0][:1])
+        with unittest.mock.patch('os.writev', writev):
+            self.buf.put(message)
+        self.assertEqual(self.buf.pop().id, message.id)
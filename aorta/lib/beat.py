@@ -0,0 +1,44 @@
+import time
+
+
+class BeatMixin:
+    """Provides the periodic beat and the round-robin selection of
+    upstream links that are shared by the publisher and the router.
+    Classes using this mixin hold their :class:`proton.Sender` instances
+    in the :attr:`senders` attribute.
+    """
+
+    #: The number of beats per second.
+    framerate = 20
+
+    # The deadline of the previous beat, as returned by time.monotonic(),
+    # and the index in self.senders of the link that was last returned by
+    # next_sendable().
+    _deadline = None
+    _rr_idx = -1
+
+    def schedule_beat(self, container):
+        """Schedule the next beat on `container`. Beats are scheduled at
+        fixed deadlines, so that the time spent handling a beat does
+        not lower the beat rate. If the handler falls behind, the next
+        beat is scheduled immediately.
+        """
+        now = time.monotonic()
+        if self._deadline is None:
+            self._deadline = now
+        self._deadline = max(self._deadline + 1/self.framerate, now)
+        container.schedule(self._deadline - now, self)
+
+    def next_sendable(self):
+        """Return the next upstream link, in round-robin order, that
+        has credit, or ``None`` if no link has credit.
+        """
+        # TODO: Also check if the links are actually established
+        # and alive.
+        n = len(self.senders)
+        for i in range(n):
+            self._rr_idx = (self._rr_idx + 1) % n
+            link = self.senders[self._rr_idx]
+            if link.credit:
+                return link
+        return None
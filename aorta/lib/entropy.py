@@ -0,0 +1,59 @@
+import os
+import threading
+
+
+class RandomPool(threading.local):
+    """Holds random bytes read from :func:`os.urandom()` in blocks of
+    :attr:`size` bytes, so that generating identifiers does not require
+    a system call for every message. Each thread has its own pool.
+    """
+    size = 4096
+
+    def __init__(self):
+        self.pid = os.getpid()
+        self.buf = b''
+        self.pos = 0
+
+    def read(self, n):
+        """Return `n` random bytes."""
+        pos = self.pos
+        if pos + n > len(self.buf):
+            self.buf = os.urandom(max(self.size, n))
+            pos = 0
+        self.pos = pos + n
+        return self.buf[pos:pos+n]
+
+
+_pool = RandomPool()
+
+
+def _reset():
+    # Child processes must not hand out the same bytes as their parent.
+    global _pool
+    _pool = RandomPool()
+
+
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=_reset)
+
+    def randbytes(n):
+        """Return `n` random bytes from the pool of the current
+        thread.
+        """
+        return _pool.read(n)
+
+else:
+    def randbytes(n):
+        """Return `n` random bytes from the pool of the current
+        thread.
+        """
+        if _pool.pid != os.getpid():
+            _reset()
+        return _pool.read(n)
+
+
+def randhex(n):
+    """Return `n` random bytes from the pool of the current thread,
+    formatted as a string of hexadecimal digits.
+    """
+    return randbytes(n).hex()
@@ -0,0 +1,52 @@
+import time
+import unittest
+
+from aorta.lib.beat import BeatMixin
+
+
+class BeatMixinTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.handler = BeatMixin()
+        self.handler.senders = [MockLink(0), MockLink(1), MockLink(1)]
+        self.scheduled = []
+
+    def schedule(self, delay, handler):
+        self.scheduled.append(delay)
+
+    def schedule_beat(self):
+        self.handler.schedule_beat(self)
+
+    def test_next_sendable_skips_links_without_credit(self):
+        self.assertIs(self.handler.next_sendable(), self.handler.senders[1])
+
+    def test_next_sendable_is_round_robin(self):
+        self.handler.next_sendable()
+        self.assertIs(self.handler.next_sendable(), self.handler.senders[2])
+        self.assertIs(self.handler.next_sendable(), self.handler.senders[1])
+
+    def test_next_sendable_returns_none_without_credit(self):
+        self.handler.senders = [MockLink(0)]
+        self.assertIsNone(self.handler.next_sendable())
+
+    def test_next_sendable_returns_none_without_senders(self):
+        self.handler.senders = []
+        self.assertIsNone(self.handler.next_sendable())
+
+    def test_schedule_beat_uses_fixed_deadlines(self):
+        self.schedule_beat()
+        deadline = self.handler._deadline
+        self.schedule_beat()
+        self.assertAlmostEqual(self.handler._deadline - deadline,
+            1/self.handler.framerate)
+
+    def test_schedule_beat_is_immediate_when_behind(self):
+        self.handler._deadline = time.monotonic() - 10
+        self.schedule_beat()
+        self.assertEqual(self.scheduled, [0])
+
+
+class MockLink:
+
+    def __init__(self, credit):
+        self.credit = credit
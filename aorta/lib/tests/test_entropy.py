@@ -0,0 +1,100 @@
+import importlib.util
+import os
+import threading
+import unittest
+
+from aorta.lib import entropy
+
+
+class RandomPoolTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.pool = entropy.RandomPool()
+
+    def test_read_returns_requested_length(self):
+        self.assertEqual(len(self.pool.read(16)), 16)
+
+    def test_read_returns_distinct_bytes(self):
+        values = set(self.pool.read(16) for i in range(1000))
+        self.assertEqual(len(values), 1000)
+
+    def test_read_refills_when_exhausted(self):
+        self.pool.size = 32
+        self.pool.read(16)
+        self.pool.read(16)
+        self.assertEqual(len(self.pool.read(16)), 16)
+        self.assertEqual(self.pool.pos, 16)
+
+    def test_read_larger_than_size(self):
+        self.pool.size = 8
+        self.assertEqual(len(self.pool.read(16)), 16)
+
+    def test_threads_do_not_share_bytes(self):
+        values = []
+        thread = threading.Thread(
+            target=lambda: values.append(entropy.randbytes(16)))
+        thread.start()
+        thread.join()
+        self.assertNotEqual(values[0], entropy.randbytes(16))
+
+
+class RandbytesTestCase(unittest.TestCase):
+
+    def load_fallback(self):
+        # Execute a copy of the module as if os.register_at_fork() was
+        # not available.
+        spec = importlib.util.spec_from_file_location(
+            'aorta.lib._entropy', entropy.__file__)
+        module = importlib.util.module_from_spec(spec)
+        register_at_fork = getattr(os, 'register_at_fork', None)
+        if register_at_fork is not None:
+            del os.register_at_fork
+        try:
+            spec.loader.exec_module(module)
+        finally:
+            if register_at_fork is not None:
+                os.register_at_fork = register_at_fork
+        return module
+
+    def test_reset_replaces_pool(self):
+        pool = entropy._pool
+        try:
+            entropy._reset()
+            self.assertIsNot(entropy._pool, pool)
+        finally:
+            entropy._pool = pool
+
+    def test_fallback_returns_requested_length(self):
+        module = self.load_fallback()
+        self.assertEqual(len(module.randbytes(16)), 16)
+
+    def test_fallback_resets_pool_if_pid_changes(self):
+        module = self.load_fallback()
+        pool = module._pool
+        pool.pid = -1
+        module.randbytes(16)
+        self.assertIsNot(module._pool, pool)
+        self.assertEqual(module._pool.pid, os.getpid())
+
+
+class RandhexTestCase(unittest.TestCase):
+
+    def test_returns_hex_string(self):
+        value = entropy.randhex(16)
+        self.assertEqual(len(value), 32)
+        int(value, 16)
+
+    @unittest.skipUnless(hasattr(os, 'fork'), "requires os.fork()")
+    def test_child_process_does_not_reuse_bytes(self):
+        entropy.randbytes(16)
+        r, w = os.pipe()
+        pid = os.fork()
+        if pid == 0:
+            os.close(r)
+            os.write(w, entropy.randbytes(16))
+            os._exit(0)
+        os.close(w)
+        child = os.read(r, 16)
+        os.close(r)
+        os.waitpid(pid, 0)
+        self.assertNotEqual(child, entropy.randbytes(16))
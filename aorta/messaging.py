@@ -1,9 +1,13 @@
-import os
-import uuid
+import collections
 
 import proton
 
-import aorta.const
+from aorta.const import P_AORTA_ID
+from aorta.const import P_ENCRYPTED
+from aorta.const import P_MESSAGE_CLASS
+from aorta.const import P_OBJECT_TYPE
+from aorta.const import P_SIGNED
+from aorta.lib.entropy import randhex
 
 
 class Message(proton.Message):
@@ -14,25 +18,82 @@ class Message(proton.Message):
 
 
 class AortaMessage(Message):
-    """The base class for all Aorta message types."""
+    """The base class for all Aorta message types. Subclasses declare
+    their message class with the `message_class` keyword argument::
+
+        class EventMessage(AortaMessage, message_class='event'):
+            pass
+    """
     message_class = None
 
+    #: The application properties that are set on each new message,
+    #: in addition to the message identifier and class.
+    default_properties = {
+        P_ENCRYPTED: False,
+        P_SIGNED: False
+    }
+
+    def __init_subclass__(cls, message_class=None, **kwargs):
+        super(AortaMessage, cls).__init_subclass__(**kwargs)
+        if message_class is not None:
+            cls.message_class = message_class
+
     def __init__(self, *args, **kwargs):
         Message.__init__(self, *args, **kwargs)
         if not isinstance(self.properties, dict):
-            self.properties = {
-                aorta.const.P_AORTA_ID: uuid.UUID(bytes=os.urandom(16)).hex,
-                aorta.const.P_ENCRYPTED: False,
-                aorta.const.P_SIGNED: False
-            }
+            self.properties = self.default_properties.copy()
+            self.properties[P_AORTA_ID] = randhex(16)
         assert self.message_class is not None,\
             "%s.message_class is None" % type(self).__name__
-        self.properties[aorta.const.P_MESSAGE_CLASS] = self.message_class
+        self.properties[P_MESSAGE_CLASS] = self.message_class
 
     def set_object_type(self, name):
         """Sets the object type in the application properties."""
-        self.properties[aorta.const.P_OBJECT_TYPE] = name
+        self.properties[P_OBJECT_TYPE] = name
+
+
+class EventMessage(AortaMessage, message_class='event'):
+    pass
+
+
+class MessagePool:
+    """Keeps :class:`proton.Message` instances that are no longer used,
+    so that they can be reused instead of allocating a new instance for
+    every message that is decoded.
+
+    Args:
+        maxlen (int): the maximum number of instances in the pool.
+    """
+
+    def __init__(self, maxlen=128):
+        self._messages = collections.deque(maxlen=maxlen)
+
+        # The identities of the instances in the pool, so that an
+        # instance that is released twice is not handed out twice.
+        self._ids = set()
+
+    def acquire(self):
+        """Return a recycled :class:`proton.Message` instance, or a new
+        instance if the pool is empty.
+        """
+        if not self._messages:
+            return proton.Message()
+        message = self._messages.popleft()
+        self._ids.discard(id(message))
+        return message
 
+    def release(self, message):
+        """Clear `message` and return it to the pool. The caller must
+        not use `message` afterwards. Releasing an instance that is
+        already in the pool has no effect.
+        """
+        if id(message) in self._ids:
+            return
+        message.clear()
+        if len(self._messages) == self._messages.maxlen:
+            self._ids.discard(id(self._messages[0]))
+        self._messages.append(message)
+        self._ids.add(id(message))
 
-class EventMessage(AortaMessage):
-    message_class = 'event'
+    def __len__(self):
+        return len(self._messages)
@@ -1,7 +1,8 @@
 import os
 import uuid
 
-from aorta import const
+from aorta.const import APROP_EVENT_OBSERVED
+from aorta.const import APROP_EVENT_OCCURRED
 from aorta.lib import timezone
 from aorta.messaging import EventMessage
 from aorta.buf.spooled import SpooledBuffer
@@ -55,10 +56,15 @@ class EventPublisher(BasePublisher):
         """
         message = EventMessage()
         message.set_object_type(name)
-        message.body = params or {}
-        message.properties[const.APROP_EVENT_OBSERVED] =\
-            observed or timezone.now()
-        message.properties[const.APROP_EVENT_OCCURRED] =\
-            occurred or timezone.now()
+        message.body = params if params is not None else {}
+        if observed is None or occurred is None:
+            now = timezone.now()
+            if observed is None:
+                observed = now
+            if occurred is None:
+                occurred = now
+        properties = message.properties
+        properties[APROP_EVENT_OBSERVED] = observed
+        properties[APROP_EVENT_OCCURRED] = occurred
         return super(EventPublisher, self).publish(message,
             on_settled=on_settled)
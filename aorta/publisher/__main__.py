@@ -2,19 +2,15 @@
 import argparse
 import logging
 import os
-import random
 import signal
 import sys
-import threading
-import time
 
 from proton.handlers import MessagingHandler
-from proton.reactor import ApplicationEvent
 from proton.reactor import Container
-from proton.reactor import EventInjector
 import proton
 
 from aorta.buf.spooled import SpooledBuffer
+from aorta.lib.beat import BeatMixin
 
 
 parser = argparse.ArgumentParser(
@@ -33,16 +29,9 @@ parser.add_argument('--no-sasl', action='store_true',
     help="disable SASL.")
 
 
-class MessagePublisher(MessagingHandler):
-    framerate = 20
+class MessagePublisher(BeatMixin, MessagingHandler):
     target = 'aorta.ingress'
 
-    @property
-    def sendables(self):
-        # TODO: Also check if the links are actually established
-        # and alives.
-        return [x for x in self.senders if x.credit]
-
     def __init__(self, remotes, channel, spool='/var/spool/aorta', buf=None,
         loglevel='INFO', use_sasl=True):
         """Initialize a new :class:`MessagePublisher` instance."""
@@ -54,9 +43,6 @@ class MessagePublisher(MessagingHandler):
         self.channel = channel
         self.senders = []
         self.must_stop = False
-        self.injector = EventInjector()
-        self.thread = threading.Thread(target=self.main_event_loop,
-            daemon=True)
 
         signal.signal(signal.SIGINT, self.signal_handler)
         signal.signal(signal.SIGHUP, self.signal_handler)
@@ -84,20 +70,10 @@ class MessagePublisher(MessagingHandler):
 
     def stop(self):
         """Stops sending messages to the AMQP remote and exit the
-        main event loop.
+        main event loop. The publisher tears down on the next timer
+        event.
         """
         self.must_stop = True
-        self.injector.trigger(ApplicationEvent('teardown'))
-
-    def main_event_loop(self):
-        """Ensure that the :class:`MessagePublisher` keeps
-        receiving beats.
-        """
-        while True:
-            if self.must_stop:
-                break
-            self.injector.trigger(ApplicationEvent('beat'))
-            time.sleep(1/self.framerate)
 
     def on_start(self, event):
         self.container = event.container
@@ -110,30 +86,34 @@ class MessagePublisher(MessagingHandler):
                 target=self.target)
             self.senders.append(sender)
 
-        event.container.selectable(self.injector)
-        self.thread.start()
+        self.schedule_beat(event.container)
+
+    def on_timer_task(self, event):
+        """Invoked by the container :attr:`framerate` times per second.
+        Tear down if the publisher must stop, otherwise beat and
+        schedule the next timer.
+        """
+        if self.must_stop:
+            self.on_teardown(event)
+            return
+        self.on_beat(event)
+        self.schedule_beat(event.container)
 
     def on_beat(self, event):
         """Periodically invoked to check for new messages in the
         spool directory.
         """
-        if not self.sendables:
-            return
-
-        # TODO: Distribute the messages more intelligently over
-        # all AMQP peers.
-        self.flush(random.choice(self.sendables))
+        # Distribute the messages over the AMQP peers by flushing the
+        # next link, in round-robin order, that has credit.
+        link = self.next_sendable()
+        if link is not None:
+            self.flush(link)
 
     def on_teardown(self, event):
         """Close all links, connections and release all other
         resources.
         """
-        # Wait for the beat thread to stop before closing the
-        # EventInjector.
-        self.thread.join()
-
-        self.injector.close()
-        for link in self.sendables:
+        for link in self.senders:
             link.close()
         self.container.stop()
 
@@ -172,20 +152,13 @@ class MessagePublisher(MessagingHandler):
         if self.must_stop:
             return
 
-        for i in range(limit):
-            if not link.credit:
-                break
-            host = self.container.get_connection_address(link.connection)
-            tag = self.buf.transfer(host,
-                source=link.source.address,
-                target=link.target.address,
-                sender=link, channel=self.channel)
-
-            # If the BaseBuffer.transfer() returns None instead of a
-            # tag, it means there was no message to send and thus we
-            # should break free from the loop.
-            if tag is None:
-                break
+        # Send at most `limit` messages, bounded by the credit of
+        # the link, in a single batch.
+        host = self.container.get_connection_address(link.connection)
+        self.buf.transfer_batch(host,
+            source=link.source.address,
+            target=link.target.address,
+            sender=link, channel=self.channel, limit=limit)
 
     def get_peer_address(self, obj):
         """Return the remote AMQP address and port for the given
@@ -1,11 +1,10 @@
 import functools
 import logging
-import os
-import uuid
 
 from proton import Disposition
 
 from aorta.lib import timezone
+from aorta.lib.entropy import randhex
 from aorta.buf.null import NullBuffer
 
 
@@ -24,6 +23,18 @@ class BasePublisher:
         if self.backend is None:
             self.backend = NullBuffer()
 
+    def close(self):
+        """Close the persistence backend. The publisher may not be used
+        afterwards.
+        """
+        self.backend.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
     def clean_properties(self, message):
         """Hook to validate the application properties of an AMQP
         message.
@@ -76,6 +87,39 @@ class BasePublisher:
         Returns:
             None
         """
+        self.publish_many([message], on_settled=on_settled)
+
+    def publish_many(self, messages, on_settled=None):
+        """Publish multiple :class:`proton.Message` instances. The
+        messages are prepared as described in :meth:`publish()` and
+        forwarded to the persistence backend in a single transaction,
+        so that their durability is ensured at once.
+
+        Args:
+            messages (list): the :class:`proton.Message` instances
+                to publish.
+            on_settled: a callable that is invoked for each message,
+                with the message as its first positional argument, when
+                the durability responsiblity is transferred from the
+                caller to the backend.
+
+        Returns:
+            None
+        """
+        for message in messages:
+            self.prepare(message)
+
+        # Place the messages on the outbound message queue and have the
+        # backend schedule them for transission to the remote AMQP peer.
+        if on_settled is not None:
+            on_settled = functools.partial(self.on_responsibility_transferred,
+                on_settled)
+        self.backend.put_many(messages, on_settled=on_settled)
+
+    def prepare(self, message):
+        """Set the properties required by the Aorta framework on
+        `message` and validate its application properties.
+        """
         # The Aorta framework considers protection against data-loss one
         # of its core features. The `durable` property of a message is
         # for this reason set to True. This does mean, however` that
@@ -87,41 +131,35 @@ class BasePublisher:
         # to 0.
         message.delivery_count = 0
 
-        if not message.creation_time:
-            message.creation_time = timezone.now()/1000
-        message.creation_time = int(message.creation_time)
-
-        if message.id is None:
-            message.id = uuid.UUID(bytes=os.urandom(16))
-
-        if message.correlation_id is None:
-            message.correlation_id = uuid.UUID(bytes=os.urandom(16))
-
-        # Make some assertions to ensure the state is as we expect. This
-        # should never fail in production environments, however.
-        assert isinstance(message.creation_time, (int,float)),\
-            repr(message.creation_time)
-        assert isinstance(message.id, (uuid.UUID,str)), repr(message.id)
-        assert isinstance(message.correlation_id, (uuid.UUID,str)),\
-            repr(message.correlation_id)
-
-        if not isinstance(message.id, str):
-            message.id = message.id.hex
-        if not isinstance(message.correlation_id, str):
-            message.correlation_id = message.correlation_id.hex
+        creation_time = message.creation_time
+        if not creation_time:
+            creation_time = timezone.now()/1000
+        message.creation_time = int(creation_time)
+
+        # Take the random bytes for both identifiers at once; they are
+        # formatted the same way as uuid.UUID.hex.
+        message_id = message.id
+        correlation_id = message.correlation_id
+        if message_id is None or correlation_id is None:
+            random = randhex(32)
+            if message_id is None:
+                message_id = random[:32]
+            if correlation_id is None:
+                correlation_id = random[32:]
+
+        # Identifiers provided by the caller may be uuid.UUID instances.
+        if not isinstance(message_id, str):
+            message_id = message_id.hex
+        if not isinstance(correlation_id, str):
+            correlation_id = correlation_id.hex
+        message.id = message_id
+        message.correlation_id = correlation_id
 
         # Run validation on the application properties. The default
         # implementation is expected to do nothing. Subclasses may
         # override this method to implement domain-specific validation.
         self.clean_properties(message)
 
-        # Place the message on the outbound message queue and have the
-        # backend schedule it for transission to the remote AMQP peer.
-        if on_settled is not None:
-            on_settled = functools.partial(self.on_responsibility_transferred,
-                on_settled)
-        self.backend.put(message, on_settled=on_settled)
-
     def on_responsibility_transferred(self, func, message):
         """Invoke `func` when the responsibility regarding the persistence
         of `message` is released from the caller.
@@ -1,4 +1,5 @@
 import unittest
+import uuid
 
 from ...messaging import Message
 from ..base import BasePublisher
@@ -57,6 +58,21 @@ class BasePublisherTestCase(unittest.TestCase):
         self.publisher.publish(m)
         self.assertIsInstance(m.correlation_id, str)
 
+    def test_publish_generates_distinct_ids(self):
+        m = self.random_message()
+        self.publisher.publish(m)
+        self.assertEqual(len(m.id), 32)
+        self.assertEqual(len(m.correlation_id), 32)
+        self.assertNotEqual(m.id, m.correlation_id)
+
+    def test_publish_converts_uuid_ids_to_hex(self):
+        m = self.random_message()
+        i = uuid.uuid4()
+        m.id = m.correlation_id = i
+        self.publisher.publish(m)
+        self.assertEqual(m.id, i.hex)
+        self.assertEqual(m.correlation_id, i.hex)
+
     def test_publish_does_not_overwrite_existing_correlation_id(self):
         m = self.random_message()
         i = m.correlation_id = 'foo'
@@ -66,4 +82,16 @@ class BasePublisherTestCase(unittest.TestCase):
     def test_on_settled_is_invoked(self):
         m = self.random_message()
         self.publisher.publish(m, lambda message: None)
-        
+
+    def test_publish_many_puts_messages_on_backend(self):
+        messages = [self.random_message(), self.random_message()]
+        n = len(self.publisher.backend)
+        self.publisher.publish_many(messages)
+        self.assertEqual(len(self.publisher.backend), n + 2)
+        self.assertTrue(all(m.durable for m in messages))
+
+    def test_publish_many_invokes_on_settled_for_each_message(self):
+        messages = [self.random_message(), self.random_message()]
+        settled = []
+        self.publisher.publish_many(messages, settled.append)
+        self.assertEqual(settled, messages)
@@ -15,6 +15,14 @@ class EventPublisherTestCase(unittest.TestCase):
             spool=tempfile.mkdtemp())
         self.buf = self.publisher.backend
 
+    def tearDown(self):
+        self.publisher.close()
+
+    def test_context_manager_closes_backend(self):
+        with EventPublisher(spool=tempfile.mkdtemp()) as publisher:
+            pass
+        self.assertIsNone(publisher.backend._dir_fd)
+
     def test_publish_sets_object_type(self):
         self.publisher.publish('FooEvent', {'foo': 1})
         m = self.buf.pop()
@@ -55,3 +63,9 @@ class EventPublisherTestCase(unittest.TestCase):
         self.publisher.publish('FooEvent', params)
         m = self.buf.pop()
         self.assertTrue(m.properties[P_EVENT_OCCURRED] is not None)
+
+    def test_event_observed_and_occurred_default_to_same_time(self):
+        self.publisher.publish('FooEvent', {'foo': 1})
+        m = self.buf.pop()
+        self.assertEqual(m.properties[P_EVENT_OBSERVED],
+            m.properties[P_EVENT_OCCURRED])
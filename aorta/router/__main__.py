@@ -3,11 +3,9 @@ import argparse
 import functools
 import logging
 import os
-import random
 import signal
 import sys
 import threading
-import time
 import uuid
 
 from proton.handlers import MessagingHandler
@@ -17,7 +15,9 @@ from proton.reactor import EventInjector
 from proton import Disposition
 import proton
 
+from aorta.buf.journaled import JournaledBuffer
 from aorta.buf.spooled import SpooledBuffer
+from aorta.lib.beat import BeatMixin
 from .base import Router
 
 
@@ -37,9 +37,13 @@ parser.add_argument('--ingress-channel', default='aorta.ingress',
     help="the ingress message channel at the AMQP peer (default: %(default)s)")
 parser.add_argument('--routes', dest='routes', default=[], action='append',
     help="specifices additional routes configuration files.")
+parser.add_argument('--journal', action='store_true',
+    help="queue messages in append-only journal segments instead of "
+         "a file per message. Messages that are already queued in the "
+         "spool directory are moved into the journal.")
 
 
-class MessageRouter(MessagingHandler):
+class MessageRouter(BeatMixin, MessagingHandler):
     """Accepts incoming messages and routes them to the configured
     destinations.
 
@@ -59,13 +63,6 @@ class MessageRouter(MessagingHandler):
     with an error condition. The only :class:`proton.Sender` instances
     allowed to exist, are the links to the upstream AMQP peers.
     """
-    framerate = 20
-
-    @property
-    def sendables(self):
-        # TODO: Also check if the links are actually established
-        # and alives.
-        return [x for x in self.senders if x.credit]
 
     def __init__(self, bind, remotes, channel, routes=None,
         spool='/var/spool/aorta', buf=None, loglevel='INFO'):
@@ -86,6 +83,10 @@ class MessageRouter(MessagingHandler):
         self.loghandler.setLevel(self.loglevel)
         self.logger.setLevel(self.loglevel)
 
+        # Debug messages on the per-message paths look up the peer
+        # address, so they are only emitted if debug logging is enabled.
+        self._debug = self.logger.isEnabledFor(logging.DEBUG)
+
         self.bind = bind
         self.remotes = remotes
         self.buf = buf or SpooledBuffer(spool=spool)
@@ -94,8 +95,6 @@ class MessageRouter(MessagingHandler):
         self.senders = []
         self.must_stop = False
         self.injector = EventInjector()
-        self.thread = threading.Thread(target=self.main_event_loop,
-            daemon=True)
 
         # Load all specified routes by filename or glob pattern.
         for path in routes:
@@ -105,8 +104,15 @@ class MessageRouter(MessagingHandler):
             if path.find('*') >= 0:
                 self.router.glob_config(path)
 
-        # Connect signal handlers. TODO: This should be done conditionally
-        # to allow running multiple instances in the same thread.
+    def install_signal_handlers(self):
+        """Stop the :class:`MessageRouter` when the process receives
+        ``SIGINT`` or ``SIGTERM``, and ignore ``SIGHUP``. Signal handlers
+        can only be installed from the main thread; in other threads this
+        does nothing, and the owner of the router must invoke
+        :meth:`stop()` instead.
+        """
+        if threading.current_thread() is not threading.main_thread():
+            return
         signal.signal(signal.SIGINT, self.signal_handler)
         signal.signal(signal.SIGHUP, self.signal_handler)
         signal.signal(signal.SIGTERM, self.signal_handler)
@@ -127,15 +133,14 @@ class MessageRouter(MessagingHandler):
         self.must_stop = True
         self.injector.trigger(ApplicationEvent('teardown'))
 
-    def main_event_loop(self):
-        """Ensure that the :class:`MessagePublisher` keeps
-        receiving beats.
+    def on_timer_task(self, event):
+        """Invoked by the container :attr:`framerate` times per second
+        to beat, until the router must stop.
         """
-        while True:
-            if self.must_stop:
-                break
-            self.injector.trigger(ApplicationEvent('beat'))
-            time.sleep(1/self.framerate)
+        if self.must_stop:
+            return
+        self.on_beat(event)
+        self.schedule_beat(event.container)
 
     def get_peer_address(self, obj):
         """Return the remote AMQP address and port for the given
@@ -149,22 +154,15 @@ class MessageRouter(MessagingHandler):
         """Periodically invoked to check for new messages in the
         spool directory.
         """
-        if not self.sendables:
-            return
-
-        # TODO: Distribute the messages more intelligently over
-        # all AMQP peers.
-        self.flush(random.choice(self.sendables))
+        link = self.next_sendable()
+        if link is not None:
+            self.flush(link)
 
     def on_teardown(self, event):
         """Close all links, connections and release all other
         resources.
         """
         self.server.close()
-
-        # Wait for the beat thread to stop before closing the
-        # EventInjector.
-        self.thread.join()
         self.injector.close()
 
         # Ensure that all links are closed so that the remote does
@@ -178,10 +176,10 @@ class MessageRouter(MessagingHandler):
         self.container = event.container
         self.server = self.container.listen(self.bind)
 
-        # The EventInjector must be started before the child thread
-        # starts beating the handler.
+        # The EventInjector delivers the teardown event when a signal
+        # is received; beats are scheduled on the container.
         event.container.selectable(self.injector)
-        self.thread.start()
+        self.schedule_beat(event.container)
 
         # Create the sending links to the AMQP upstream peers.
         for addr in self.remotes:
@@ -194,22 +192,16 @@ class MessageRouter(MessagingHandler):
         if self.must_stop:
             return
 
-        for i in range(limit):
-            host = self.get_peer_address(link)
-            if not link.credit:
-                self.logger.debug("Credit depleted for link (peer: %s)",
-                    host)
-                break
-            tag = self.buf.transfer(host,
-                source=link.source.address,
-                target=link.target.address,
-                sender=link)
-
-            # If the BaseBuffer.transfer() returns None instead of a
-            # tag, it means there was no message to send and thus we
-            # should break free from the loop.
-            if tag is None:
-                break
+        # Send at most `limit` messages, bounded by the credit of
+        # the link, in a single batch.
+        host = self.get_peer_address(link)
+        if not link.credit:
+            self.logger.debug("Credit depleted for link (peer: %s)", host)
+            return
+        self.buf.transfer_batch(host,
+            source=link.source.address,
+            target=link.target.address,
+            sender=link, limit=limit)
 
     ###################################################################
     ##  MESSAGEROUTER BUSINESS LOGIC
@@ -243,44 +235,58 @@ class MessageRouter(MessagingHandler):
         d = event.delivery
         l = event.link
 
-        for route in self.router.route(m):
-            self.logger.debug("Routing delivery %s to %s (peer: %s)",
-                d.tag, route, self.get_peer_address(l))
-            m.address = route
-            self.buf.put(m, on_settled=self.on_message_persisted)
+        # Persist the message for all routes in a single transaction. The
+        # message is encoded when it is enqueued, so each copy keeps its
+        # own address. The peer is informed that the message is accepted
+        # once the transaction is committed.
+        routes = self.router.route(m)
+        with self.buf.transaction():
+            for route in routes:
+                if self._debug:
+                    self.logger.debug(
+                        "Routing delivery %s to %s (peer: %s)",
+                        d.tag, route, self.get_peer_address(l))
+                m.address = route
+                self.buf.put(m)
 
         l.flow(1)
         self.settle(d, Disposition.ACCEPTED)
+        if routes:
+            self.on_message_persisted(m)
 
     def on_message_persisted(self, message):
-        if self.sendables:
-            self.flush(random.choice(self.sendables))
+        link = self.next_sendable()
+        if link is not None:
+            self.flush(link)
 
     ###################################################################
     ##  MESSAGEPUBLISHER BUSINESS LOGIC
     ###################################################################
     def on_sendable(self, event):
         link = event.link
-        peer = self.get_peer_address(link)
-        self.logger.debug(
-            "AMQP link sendable (target: %s, name: %s, host: %s, credit: %s)",
-            link.target.address, link.name, self.get_peer_address(link),
-            link.credit)
+        if self._debug:
+            self.logger.debug(
+                "AMQP link sendable (target: %s, name: %s, host: %s, "
+                "credit: %s)", link.target.address, link.name,
+                self.get_peer_address(link), link.credit)
         self.flush(link=link)
 
     def on_accepted(self, event):
-        self.logger.debug("Delivery %s accepted (host: %s)",
-            event.delivery.tag, self.get_peer_address(event.link))
+        if self._debug:
+            self.logger.debug("Delivery %s accepted (host: %s)",
+                event.delivery.tag, self.get_peer_address(event.link))
         event.delivery.settle()
 
     def on_rejected(self, event):
-        self.logger.debug("Delivery %s rejected (host: %s)",
-            event.delivery.tag, self.get_peer_address(event.link))
+        if self._debug:
+            self.logger.debug("Delivery %s rejected (host: %s)",
+                event.delivery.tag, self.get_peer_address(event.link))
         event.delivery.settle()
 
     def on_released(self, event):
-        self.logger.debug("Delivery %s released (host: %s)",
-            event.delivery.tag, self.get_peer_address(event.link))
+        if self._debug:
+            self.logger.debug("Delivery %s released (host: %s)",
+                event.delivery.tag, self.get_peer_address(event.link))
         event.delivery.settle()
 
     def on_settled(self, event):
@@ -288,15 +294,20 @@ class MessageRouter(MessagingHandler):
             remote_state=event.delivery.remote_state,
             disposition=event.delivery.remote)
         event.delivery.settle()
-        self.logger.debug("Delivery %s settled (host: %s)",
-            event.delivery.tag, self.get_peer_address(event.link))
+        if self._debug:
+            self.logger.debug("Delivery %s settled (host: %s)",
+                event.delivery.tag, self.get_peer_address(event.link))
 
 
 def main(argv):
     args = parser.parse_args(argv)
+    buf = None
+    if args.journal:
+        buf = JournaledBuffer(spool=args.spool)
     handler = MessageRouter(args.bind, args.peers, routes=args.routes,
-        channel=args.ingress_channel, spool=args.spool,
+        channel=args.ingress_channel, spool=args.spool, buf=buf,
         loglevel=args.loglevel)
+    handler.install_signal_handlers()
     Container(handler).run()
 
 
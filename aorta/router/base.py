@@ -1,9 +1,10 @@
 import glob
 import logging
 
+from marshmallow import ValidationError
 import yaml
 
-from aorta.router.schema import RuleSchema
+from aorta.router.rule import Rule
 from aorta.router.exc import UnknownField
 from aorta.router.exc import InvalidComparison
 
@@ -13,7 +14,6 @@ class Router(object):
     routed.
     """
     logger = logging.getLogger('aorta.router')
-    schema = RuleSchema(many=True)
 
     def __init__(self, rules=None, always_route=None, sink=None):
         self.rules = rules or []
@@ -22,10 +22,21 @@ class Router(object):
         self.config = []
 
     def load_config(self, path):
-        """Loads a ruleset configuration from the given `path`."""
+        """Loads a ruleset configuration from the given `path`.
+
+        Raises:
+            marshmallow.ValidationError: the configuration is not a list
+                of valid rules.
+        """
         self.logger.debug("Loading routes from %s", path)
         with open(path, 'r') as f:
-            rules = self.schema.load(yaml.safe_load(f.read()))
+            config = yaml.safe_load(f.read())
+        if not isinstance(config, list):
+            raise ValidationError("Invalid routing configuration: %s" % path)
+        try:
+            rules = [Rule.from_dict(x) for x in config]
+        except ValueError as e:
+            raise ValidationError(str(e))
         self.rules.extend(rules)
         self.config.append(path)
 
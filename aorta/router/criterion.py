@@ -43,6 +43,27 @@ class Criterion(object):
         if self.op == 'IN' and value is not None:
             self.value = set(self.value)
 
+    @classmethod
+    def from_dict(cls, params):
+        """Create a new :class:`Criterion` from a dictionary as it
+        appears in a routing configuration, with the ``name``,
+        ``operator`` and ``value`` keys. This is equivalent to loading
+        it with :class:`~aorta.router.schema.CriterionSchema`, without
+        the overhead of the schema.
+
+        Raises:
+            ValueError: `params` is not a valid criterion.
+        """
+        try:
+            attname = params['name']
+            op = params['operator']
+            value = params['value']
+        except (KeyError, TypeError):
+            raise ValueError("Invalid criterion: %s" % repr(params))
+        if not isinstance(attname, str) or op not in cls._matching_ops:
+            raise ValueError("Invalid criterion: %s" % repr(params))
+        return cls(attname, op, value)
+
     def get(self, dto, attname):
         try:
             return getattr(dto, attname)
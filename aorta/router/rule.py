@@ -32,6 +32,35 @@ class Rule(object):
         self.rts = return_to_sender
         self.exclude = set(exclude or [])
 
+    @classmethod
+    def from_dict(cls, params):
+        """Create a new :class:`Rule` from a dictionary as it appears
+        in a routing configuration. This is equivalent to loading it
+        with :class:`~aorta.router.schema.RuleSchema`, without the
+        overhead of the schema.
+
+        Raises:
+            ValueError: `params` is not a valid rule.
+        """
+        try:
+            destinations = params['destinations']
+            criterions = params['criterions']
+        except (KeyError, TypeError):
+            raise ValueError("Invalid rule: %s" % repr(params))
+        exclude = params.get('exclude') or []
+        return_to_sender = params.get('return_to_sender', False)
+        valid = isinstance(destinations, list)\
+            and isinstance(criterions, list)\
+            and isinstance(exclude, list)\
+            and isinstance(return_to_sender, bool)
+        if not valid or not criterions\
+        or not all(isinstance(x, str) for x in exclude):
+            raise ValueError("Invalid rule: %s" % repr(params))
+        return cls(destinations,
+            criterions=[Criterion.from_dict(x) for x in criterions],
+            return_to_sender=return_to_sender,
+            exclude=exclude)
+
     def match(self, dto):
         """Matches the event contained in the Data Transfer
         Object (DTO) against all criterions.
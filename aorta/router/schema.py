@@ -6,6 +6,11 @@ from aorta.router.criterion import Criterion
 from aorta.router.rule import Rule
 
 
+# Schema instances deep-copy their declared fields; a tuple of strings
+# is not copied, unlike a list.
+OPERATORS = tuple(Criterion._matching_ops)
+
+
 class CriterionSchema(marshmallow.Schema):
     attname = fields.String(
         required=True,
@@ -15,7 +20,7 @@ class CriterionSchema(marshmallow.Schema):
     op = fields.String(
         required=True,
         validate=[
-            validate.OneOf(list(Criterion._matching_ops.keys()))
+            validate.OneOf(OPERATORS)
         ],
         data_key='operator'
     )
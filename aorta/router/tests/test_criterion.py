@@ -16,6 +16,20 @@ class CriterionTestCase(unittest.TestCase):
             }
         }
 
+    def test_from_dict(self):
+        c = Criterion.from_dict(
+            {'name': 'header.foo', 'operator': 'EQ', 'value': 1})
+        self.assertTrue(c.match(self.dto))
+
+    def test_from_dict_with_unknown_operator_raises(self):
+        with self.assertRaises(ValueError):
+            Criterion.from_dict(
+                {'name': 'header.foo', 'operator': 'FOO', 'value': 1})
+
+    def test_from_dict_with_missing_key_raises(self):
+        with self.assertRaises(ValueError):
+            Criterion.from_dict({'name': 'header.foo', 'operator': 'EQ'})
+
     def test_match_simple_scalar(self):
         c = Criterion('header.foo','EQ', 1)
         self.assertTrue(c.match(self.dto))
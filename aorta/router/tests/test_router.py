@@ -119,6 +119,20 @@ class LoadFromPathRouterTestCase(RouterTestCase):
             f.seek(0)
             self.router.load_config(f.name)
 
+    def load_config(self, config):
+        with tempfile.NamedTemporaryFile('w') as f:
+            f.write(yaml.safe_dump(config))
+            f.seek(0)
+            self.router.load_config(f.name)
+
+    def test_config_must_be_list(self):
+        with self.assertRaises(marshmallow.exceptions.ValidationError):
+            self.load_config({'destinations': ['foo']})
+
+    def test_invalid_rule_raises_validationerror(self):
+        with self.assertRaises(marshmallow.exceptions.ValidationError):
+            self.load_config([{'bla': 'foo'}])
+
 
 class LoadGlobRouterTestCase(RouterTestCase):
 
@@ -41,3 +41,45 @@ class RuleTestCase(unittest.TestCase):
         self.rule.add_criterion('header.foo','IN', None)
         with self.assertRaises(InvalidComparison):
             self.rule.match(self.dto)
+
+    def test_from_dict(self):
+        rule = Rule.from_dict({
+            'destinations': ['foo'],
+            'exclude': ['bar'],
+            'criterions': [
+                {'name': 'header.foo', 'operator': 'EQ', 'value': 1}
+            ]
+        })
+        self.assertTrue(rule.match(self.dto))
+        self.assertFalse(rule.rts)
+        self.assertEqual(rule.get_destinations(), ({'foo'}, {'bar'}))
+
+    def test_from_dict_requires_criterions(self):
+        with self.assertRaises(ValueError):
+            Rule.from_dict({'destinations': ['foo'], 'criterions': []})
+
+    def test_from_dict_requires_destinations(self):
+        with self.assertRaises(ValueError):
+            Rule.from_dict({'criterions': [
+                {'name': 'header.foo', 'operator': 'EQ', 'value': 1}
+            ]})
+
+    def test_from_dict_requires_boolean_return_to_sender(self):
+        with self.assertRaises(ValueError):
+            Rule.from_dict({
+                'destinations': ['foo'],
+                'return_to_sender': 'false',
+                'criterions': [
+                    {'name': 'header.foo', 'operator': 'EQ', 'value': 1}
+                ]
+            })
+
+    def test_from_dict_requires_string_exclude(self):
+        with self.assertRaises(ValueError):
+            Rule.from_dict({
+                'destinations': ['foo'],
+                'exclude': [1],
+                'criterions': [
+                    {'name': 'header.foo', 'operator': 'EQ', 'value': 1}
+                ]
+            })
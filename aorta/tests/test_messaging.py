@@ -1,9 +1,13 @@
 import unittest
 
+from aorta.const import P_AORTA_ID
+from aorta.const import P_ENCRYPTED
 from aorta.const import P_MESSAGE_CLASS
 from aorta.const import P_OBJECT_TYPE
 from aorta.messaging import AortaMessage
 from aorta.messaging import EventMessage
+from aorta.messaging import Message
+from aorta.messaging import MessagePool
 
 
 class AortaMessageTestCase(unittest.TestCase):
@@ -12,18 +16,81 @@ class AortaMessageTestCase(unittest.TestCase):
         with self.assertRaises(AssertionError):
             AortaMessage()
 
+    def test_subclass_sets_message_class(self):
+        class FooMessage(AortaMessage, message_class='foo'):
+            pass
+        self.assertEqual(FooMessage().properties[P_MESSAGE_CLASS], 'foo')
+
 
 class EventMessageTestCase(unittest.TestCase):
 
+    def setUp(self):
+        self.message = EventMessage()
+
     def test_init_sets_properties_to_dict(self):
-        m = EventMessage()
-        self.assertIsInstance(m.properties, dict)
+        self.assertIsInstance(self.message.properties, dict)
 
     def test_init_sets_amc_property(self):
+        self.assertEqual(self.message.properties[P_MESSAGE_CLASS], 'event')
+
+    def test_init_sets_default_properties(self):
+        self.assertFalse(self.message.properties[P_ENCRYPTED])
+        self.assertIn(P_AORTA_ID, self.message.properties)
+
+    def test_init_does_not_share_properties(self):
         m = EventMessage()
-        self.assertEqual(m.properties[P_MESSAGE_CLASS], 'event')
+        self.message.set_object_type('foo')
+        self.assertNotIn(P_OBJECT_TYPE, m.properties)
+        self.assertNotIn(P_OBJECT_TYPE, EventMessage.default_properties)
 
     def test_set_object_type_sets_property(self):
-        m = EventMessage()
-        m.set_object_type('foo')
-        self.assertEqual(m.properties[P_OBJECT_TYPE], 'foo')
+        self.message.set_object_type('foo')
+        self.assertEqual(self.message.properties[P_OBJECT_TYPE], 'foo')
+
+
+class MessagePoolTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.pool = MessagePool(maxlen=2)
+
+    def test_acquire_returns_new_message_if_empty(self):
+        self.assertIsNotNone(self.pool.acquire())
+
+    def test_acquire_returns_released_message(self):
+        m = self.pool.acquire()
+        self.pool.release(m)
+        self.assertIs(self.pool.acquire(), m)
+
+    def test_release_clears_message(self):
+        m = self.pool.acquire()
+        m.body = 'foo'
+        self.pool.release(m)
+        self.assertIsNone(self.pool.acquire().body)
+
+    def test_release_is_bounded(self):
+        for m in [Message(), Message(), Message()]:
+            self.pool.release(m)
+        self.assertEqual(len(self.pool), 2)
+
+    def test_double_release_is_ignored(self):
+        m = Message()
+        self.pool.release(m)
+        self.pool.release(m)
+        self.assertEqual(len(self.pool), 1)
+        self.assertIs(self.pool.acquire(), m)
+        self.assertIsNot(self.pool.acquire(), m)
+
+    def test_acquired_message_can_be_released_again(self):
+        m = Message()
+        self.pool.release(m)
+        self.pool.acquire()
+        self.pool.release(m)
+        self.assertEqual(len(self.pool), 1)
+
+    def test_evicted_message_can_be_released_again(self):
+        m = Message()
+        self.pool.release(m)
+        self.pool.release(Message())
+        self.pool.release(Message())
+        self.pool.release(m)
+        self.assertTrue(any(x is m for x in self.pool._messages))
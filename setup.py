@@ -16,5 +16,6 @@ setup(
 	    'PyYAML',
         'marshmallow',
     ],
-    packages=find_packages()
+    packages=find_packages(),
+    python_requires='>=3.6'
 )